@@ -0,0 +1,35 @@
+"""add updated_at for media_files
+
+Revision ID: 2c41f7a9d6e0
+Revises: 7d2a4c8e913b
+Create Date: 2026-10-18 21:14:52.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c41f7a9d6e0'
+down_revision: Union[str, Sequence[str], None] = '7d2a4c8e913b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('media_files', sa.Column('updated_at', sa.DateTime(timezone=True),
+                                           server_default=sa.text('now()'), nullable=False))
+    op.create_index(op.f('ix_media_files_updated_at'), 'media_files', ['updated_at'], unique=False)
+    # Функция set_updated_at() создана миграцией 5b7e2c9d4a1f
+    op.execute("CREATE TRIGGER media_files_set_updated_at BEFORE UPDATE ON media_files "
+               "FOR EACH ROW EXECUTE FUNCTION set_updated_at()")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS media_files_set_updated_at ON media_files")
+    op.drop_index(op.f('ix_media_files_updated_at'), table_name='media_files')
+    op.drop_column('media_files', 'updated_at')
@@ -0,0 +1,41 @@
+"""add media_files with reference counts
+
+Revision ID: 7d2a4c8e913b
+Revises: 5b7e2c9d4a1f
+Create Date: 2026-10-18 16:42:07.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2a4c8e913b'
+down_revision: Union[str, Sequence[str], None] = '5b7e2c9d4a1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_files',
+                    sa.Column('path', sa.String(length=255), nullable=False),
+                    sa.Column('refcount', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('path'))
+    # Счётчики для уже существующих карточек: и видео, и превью
+    op.execute("""
+        INSERT INTO media_files (path, refcount)
+        SELECT path, count(*) FROM (
+            SELECT video_url AS path FROM cards
+            UNION ALL
+            SELECT preview_image_url FROM cards WHERE preview_image_url IS NOT NULL AND preview_image_url <> ''
+        ) AS paths
+        GROUP BY path
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('media_files')
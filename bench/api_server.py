@@ -0,0 +1,129 @@
+"""Локальная замена API карточек поверх синтетического каталога.
+
+Запуск из корня проекта:
+    python -m bench.api_server --port 8080 --latency 20
+    API_URL=http://127.0.0.1:8080 python main.py
+
+Отвечает на те же запросы, что делает utils.ApiClient: /api/cards
+(categoryId, all, limit, offset) и /api/categories/ids. Ответы снабжаются ETag,
+на If-None-Match с тем же тегом приходит 304 — как от настоящего сервера с кэшем.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from bench.catalog import DEFAULT_URL
+from models import Card, Category
+from utils import card_to_dict
+
+
+class CatalogApi:
+    """Запросы к каталогу в том же порядке сортировки, что и у приложения"""
+
+    def __init__(self, url=DEFAULT_URL):
+        self.engine = create_engine(url)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def cards(self, category_id, all=False, limit=None, offset=0) -> list[dict]:
+        query = select(Card).where(Card.category_id == category_id)
+        if not all:
+            query = query.where(Card.invisible.is_(False))
+        query = query.order_by(Card.title, Card.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.Session() as s:
+            return [card_to_dict(card) for card in s.execute(query).scalars()]
+
+    def category_ids(self) -> list[str]:
+        """Сначала корневые категории по имени: первую из них приложение открывает при старте"""
+        query = select(Category.id).order_by(Category.parent_id.is_not(None), Category.name)
+        with self.Session() as s:
+            return [str(id_) for id_ in s.execute(query).scalars()]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    api: CatalogApi = None
+    latency = 0.0
+    verbose = False
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == "/api/cards":
+                limit = params.get("limit")
+                body = self.api.cards(uuid.UUID(params["categoryId"]), params.get("all") == "True",
+                                      int(limit) if limit is not None else None, int(params.get("offset", 0)))
+            elif url.path == "/api/categories/ids":
+                body = self.api.category_ids()
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError):
+            self.send_error(400)
+            return
+        self.send_json(body)
+
+    def send_json(self, body):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def serve(url=DEFAULT_URL, host="127.0.0.1", port=0, latency_ms=0, verbose=False) -> ThreadingHTTPServer:
+    """Сервер в фоновом потоке; port=0 — любой свободный. Адрес: server.base_url"""
+    handler = type("Handler", (ApiHandler,), {
+        "api": CatalogApi(url),
+        "latency": latency_ms / 1000,
+        "verbose": verbose,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.base_url = f"http://{host}:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = serve(args.url, args.host, args.port, args.latency, args.verbose)
+    print(f"API: {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Бенчмарк навигации по CategoryTreeModel на синтетическом дереве.
+
+Запуск из корня проекта:
+    python -m bench.category_tree --nodes 10000
+"""
+import argparse
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+from PySide6.QtCore import QCoreApplication, QModelIndex
+
+from category_tree import CategoryTreeModel, build_category_tree
+
+
+class LinearParentModel(CategoryTreeModel):
+    """Прежняя реализация parent() с поиском строки в списке — для сравнения"""
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_item = index.internalPointer().parent
+        if parent_item is None:
+            return QModelIndex()
+        if parent_item.parent is None:
+            row = self.root_items.index(parent_item)
+        else:
+            row = parent_item.parent.children.index(parent_item)
+        return self.createIndex(row, 0, parent_item)
+
+
+def synthetic_categories(nodes, fanout, new_id=uuid.uuid4):
+    """Плоский список категорий широкого дерева: fanout корней, дети раскладываются
+    по узлам уровня по кругу, так что у каждого узла не больше fanout детей"""
+    categories = []
+    level = []
+    for created in range(min(nodes, fanout)):
+        category = SimpleNamespace(id=new_id(), name=f"Категория {created}", parent_id=None)
+        categories.append(category)
+        level.append(category)
+    while len(categories) < nodes:
+        count = min(nodes - len(categories), len(level) * fanout)
+        next_level = []
+        for i in range(count):
+            child = SimpleNamespace(id=new_id(), name=f"Категория {len(categories)}",
+                                    parent_id=level[i % len(level)].id)
+            categories.append(child)
+            next_level.append(child)
+        level = next_level
+    return categories
+
+
+def walk(model):
+    """Обход всех узлов так, как это делает представление: index/rowCount/parent"""
+    indexes = []
+    stack = [QModelIndex()]
+    while stack:
+        parent = stack.pop()
+        for row in range(model.rowCount(parent)):
+            index = model.index(row, 0, parent)
+            model.parent(index)
+            indexes.append(index)
+            stack.append(index)
+    return indexes
+
+
+def measure(model_cls, categories, repeat):
+    start = time.perf_counter()
+    model = model_cls(build_category_tree(categories).roots)
+    build = time.perf_counter() - start
+    timings = []
+    indexes = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        indexes = walk(model)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for index in indexes:
+            model.parent(index)
+    parent_time = (time.perf_counter() - start) / repeat
+    return {
+        "build_ms": round(build * 1000, 3),
+        "walk_ms_min": round(min(timings) * 1000, 3),
+        "walk_ms_avg": round(sum(timings) / len(timings) * 1000, 3),
+        "parent_ms": round(parent_time * 1000, 3),
+        "nodes": len(indexes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--fanout", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    categories = synthetic_categories(args.nodes, args.fanout)
+    result = {
+        "benchmark": "category_tree",
+        "nodes": args.nodes,
+        "fanout": args.fanout,
+        "indexed": measure(CategoryTreeModel, categories, args.repeat),
+        "linear_parent": measure(LinearParentModel, categories, args.repeat),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return app
+
+
+if __name__ == '__main__':
+    main()
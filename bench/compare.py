@@ -0,0 +1,43 @@
+"""Сравнение двух отчётов bench.run: отношение медиан нового к базовому.
+
+Запуск из корня проекта:
+    python -m bench.compare bench-1.1.json bench-1.2.json
+"""
+import argparse
+import json
+
+
+def compare(base, new) -> dict:
+    """ratio < 1 — стало быстрее; замеры, которых нет в одном из отчётов, пропускаются"""
+    result = {}
+    for name, current in new["results"].items():
+        previous = base["results"].get(name)
+        if not previous or "median_ms" not in previous or "median_ms" not in current:
+            continue
+        result[name] = {
+            "base_ms": previous["median_ms"],
+            "new_ms": current["median_ms"],
+            "ratio": round(current["median_ms"] / previous["median_ms"], 3) if previous["median_ms"] else None,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    print(json.dumps({
+        "base": base.get("revision"),
+        "new": new.get("revision"),
+        "results": compare(base, new),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""Бенчмарки отрисовки окон (Qt offscreen) на каталогах разного размера.
+
+Запуск из корня проекта:
+    python -m bench.gui --scales 1000,10000,100000 --output gui.json
+
+Для каждого размера генерируется каталог (bench.catalog), а окна
+замеряются в отдельном процессе во временном каталоге: кэши, локальная копия
+и снимок прошлого запуска у каждого замера свои. Замеры: переключение
+категории, отрисовка всей сетки, кадры прокрутки, открытие окон
+редактирования и подгонка таблиц по содержимому.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication, QEventLoop, QThreadPool
+from PySide6.QtGui import QPixmapCache
+from PySide6.QtWidgets import QApplication
+
+from bench.catalog import generate_catalog
+from bench.run import git_revision, measure, stats
+from card_grid import CARD_SIZE
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+WINDOW_SIZE = (1400, 1000)
+FRAME_BUDGET_MS = 1000 / 60
+
+
+def wait_for(predicate, timeout=60):
+    """Крутим цикл событий, пока условие не выполнится"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("окно не дождалось данных")
+        QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 10)
+
+
+def settle():
+    """Обрабатываем накопившиеся события, не дожидаясь новых"""
+    QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents)
+
+
+def largest_category_id():
+    """Категория с наибольшим числом карточек — в ней есть что рисовать и прокручивать"""
+    from sqlalchemy import func, select
+
+    from models import Card
+    from session import Session
+
+    with Session() as s:
+        return s.execute(select(Card.category_id).group_by(Card.category_id)
+                         .order_by(func.count().desc()).limit(1)).scalar()
+
+
+def bench_main_window(categories, repeat, sample, frames_limit):
+    from main import MainWindow
+
+    window = MainWindow()
+    window.resize(*WINDOW_SIZE)
+    window.show()
+    done = []
+    window.cards_loader.done.connect(lambda: done.append(True))
+    wait_for(lambda: window.category_tree is not None and len(window.category_tree) == categories and done)
+    viewport = window.cards_view.viewport()
+
+    def switch(node):
+        count = len(done)
+        window.category.setCurrentIndex(window.category_model.nodeIndex(node))
+        window.load_cards()
+        wait_for(lambda: len(done) > count)
+        viewport.repaint()
+
+    nodes = random.Random(0).sample(list(window.category_tree), min(sample, categories))
+    results = {
+        "main.category_switch.first": stats(measure_each(switch, nodes), categories=len(nodes)),
+        "main.category_switch.again": stats(measure_each(switch, nodes), categories=len(nodes)),
+    }
+
+    switch(window.category_tree.by_id[largest_category_id()])
+    results["main.grid_paint"] = stats(measure(viewport.repaint, repeat), cards=len(window.cards_model.items))
+    results["main.grid_paint.cold_pixmaps"] = stats(measure(viewport.repaint, repeat, setup=QPixmapCache.clear),
+                                                    cards=len(window.cards_model.items))
+    results["main.window_paint"] = stats(measure(window.repaint, repeat))
+
+    bar = window.cards_view.verticalScrollBar()
+    step = CARD_SIZE.height() // 2
+    frames = []
+    for _ in range(frames_limit):
+        if bar.value() >= bar.maximum():
+            break
+        start = time.perf_counter()
+        bar.setValue(bar.value() + step)
+        settle()
+        viewport.repaint()
+        frames.append(time.perf_counter() - start)
+    if frames:
+        results["main.scroll_frame"] = stats(
+            frames, cards=len(window.cards_model.items),
+            over_budget=sum(frame * 1000 > FRAME_BUDGET_MS for frame in frames))
+    window.close()
+    # Фоновые задачи окна дорабатывают, чтобы не мешать следующим замерам
+    window.prefetcher.pause()
+    window.prefetcher.pool.waitForDone()
+    window.background_pool.waitForDone()
+    return results
+
+
+def measure_each(fn, items):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def resize_to_contents(table):
+    table.resizeColumnsToContents()
+    table.resizeRowsToContents()
+
+
+def bench_edit_cards(repeat, sample):
+    from edit_cards import EditCardsWindow
+
+    category_id = largest_category_id()
+    start = time.perf_counter()
+    window = EditCardsWindow(category_id)
+    window.show()
+    settle()
+    opened = time.perf_counter() - start
+    table = window.ui.tableView
+
+    results = {
+        "edit_cards.open": stats([opened], rows=window.model.rowCount()),
+        "edit_cards.resize_to_contents.cold": stats(
+            measure(lambda: resize_to_contents(table), 1, setup=QPixmapCache.clear), rows=window.model.rowCount()),
+        "edit_cards.resize_to_contents": stats(measure(lambda: resize_to_contents(table), repeat),
+                                               rows=window.model.rowCount()),
+        "edit_cards.paint": stats(measure(table.viewport().repaint, repeat), rows=window.model.rowCount()),
+    }
+
+    combo = window.ui.comboBox
+    indexes = random.Random(0).sample(range(combo.count()), min(sample, combo.count()))
+
+    def switch(i):
+        combo.setCurrentIndex(i)
+        settle()
+        table.viewport().repaint()
+
+    results["edit_cards.category_switch"] = stats(measure_each(switch, indexes), categories=len(indexes))
+    window.close()
+    return results
+
+
+def bench_edit_catalog(repeat):
+    from edit_catalog import EditCatalogWindow
+
+    start = time.perf_counter()
+    window = EditCatalogWindow()
+    window.show()
+    settle()
+    opened = time.perf_counter() - start
+    table = window.ui.tableView
+    results = {
+        "edit_catalog.open": stats([opened], rows=window.model.rowCount()),
+        "edit_catalog.resize_to_contents": stats(measure(lambda: resize_to_contents(table), repeat),
+                                                 rows=window.model.rowCount()),
+        "edit_catalog.paint": stats(measure(table.viewport().repaint, repeat), rows=window.model.rowCount()),
+    }
+    window.close()
+    return results
+
+
+def run_scale(url, categories, repeat, sample, frames):
+    """Замеры одного каталога; запускается в отдельном процессе"""
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from bench.api_server import serve
+    from session import configure_engine
+
+    configure_engine(url=url)
+    server = serve(url)
+    os.environ["API_URL"] = server.base_url
+    try:
+        results = {}
+        results.update(bench_main_window(categories, repeat, sample, frames))
+        results.update(bench_edit_cards(repeat, sample))
+        results.update(bench_edit_catalog(repeat))
+    finally:
+        QThreadPool.globalInstance().waitForDone()
+        server.shutdown()
+    return results, app
+
+
+def run_scales(scales, repeat, sample, frames, thumbnails) -> list[dict]:
+    reports = []
+    for cards in scales:
+        categories = max(10, cards // 100)
+        workdir = tempfile.mkdtemp(prefix="bench-gui-")
+        try:
+            url = f"sqlite:///{os.path.join(workdir, 'catalog.sqlite3')}"
+            generate_catalog(url, categories, cards, thumbnails=thumbnails, reset=True)
+            env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, QT_QPA_PLATFORM="offscreen")
+            process = subprocess.run(
+                [sys.executable, "-m", "bench.gui", "--url", url, "--categories", str(categories),
+                 "--repeat", str(repeat), "--sample", str(sample), "--frames", str(frames)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True)
+            reports.append({
+                "cards": cards,
+                "categories": categories,
+                "results": json.loads(process.stdout),
+            })
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return reports
+
+
+def scaling(reports) -> dict:
+    """Медиана каждого замера по размерам каталога: {замер: {карточек: мс}}"""
+    result = {}
+    for report in reports:
+        for name, values in report["results"].items():
+            result.setdefault(name, {})[str(report["cards"])] = values["median_ms"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1000,10000,100000", help="размеры каталога в карточках")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=20, help="сколько категорий переключать")
+    parser.add_argument("--frames", type=int, default=120, help="кадров прокрутки")
+    parser.add_argument("--thumbnails", type=int, default=200)
+    parser.add_argument("--output")
+    # Внутренний режим: замер одного готового каталога в текущем процессе
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--categories", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.url:
+        results, app = run_scale(args.url, args.categories, args.repeat, args.sample, args.frames)
+        print(json.dumps(results, ensure_ascii=False))
+        return app
+
+    reports = run_scales([int(cards) for cards in args.scales.split(",")], args.repeat, args.sample,
+                         args.frames, args.thumbnails)
+    report = {
+        "suite": "training-planner-gui",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "params": {
+            "scales": args.scales,
+            "repeat": args.repeat,
+            "sample": args.sample,
+            "frames": args.frames,
+            "window": WINDOW_SIZE,
+        },
+        "scales": reports,
+        "scaling": scaling(reports),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Набор бенчмарков на синтетическом каталоге.
+
+Запуск из корня проекта (каталог — python -m bench.catalog):
+    python -m bench.run --output bench-1.2.json
+    python -m bench.compare bench-1.1.json bench-1.2.json
+
+API поднимается локально (bench.api_server) поверх того же каталога,
+либо берётся готовый через --api-url. Результат — JSON: по каждому замеру
+min/median/p95/mean в миллисекундах и параметры запуска.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import PySide6
+from PySide6.QtCore import Qt, QCoreApplication, QEventLoop
+from PySide6.QtGui import QPixmapCache
+from PySide6.QtWidgets import QApplication
+
+from bench.catalog import DEFAULT_URL
+from bench.category_tree import walk
+from constants import CARDS_PAGE_SIZE
+
+
+def stats(timings, **extra) -> dict:
+    timings = sorted(timings)
+    result = {
+        "repeat": len(timings),
+        "min_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[max(0, round(0.95 * len(timings)) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def measure(fn, repeat, setup=None):
+    """Время каждого из repeat вызовов fn; setup выполняется перед вызовом и не замеряется"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_category_tree(repeat):
+    from category_tree import CategoryRow, CategoryTreeModel, build_category_tree, load_category_tree
+    from session import Session
+
+    with Session() as s:
+        load_timings = measure(lambda: load_category_tree(s), repeat)
+        tree = load_category_tree(s)
+    rows = [CategoryRow(node.id, node.name, node.parent_id) for node in tree]
+    model = CategoryTreeModel(build_category_tree(rows).roots)
+    return {
+        "category_tree.load": stats(load_timings, nodes=len(rows)),
+        "category_tree.build": stats(measure(lambda: build_category_tree(rows), repeat), nodes=len(rows)),
+        "category_tree.navigation": stats(measure(lambda: walk(model), repeat), nodes=len(rows)),
+    }, tree
+
+
+def bench_load_cards(tree, repeat, sample):
+    """Фоновая часть MainWindow.load_cards: первая страница категории через API и поддерево из БД"""
+    from utils import api_client
+    from workers import fetch_cards_page
+
+    categories = random.Random(0).sample([node.id for node in tree], min(sample, len(tree)))
+    roots = [node.id for node in tree.roots][:sample]
+
+    def pages(ids, subtree=False):
+        for category_id in ids:
+            fetch_cards_page(category_id, None, subtree)
+
+    return {
+        "load_cards.cold": stats(measure(lambda: pages(categories), repeat, setup=api_client().invalidate),
+                                 categories=len(categories)),
+        # Кэш уже заполнен: сервер отвечает 304 на условные запросы
+        "load_cards.revalidate": stats(measure(lambda: pages(categories), repeat), categories=len(categories)),
+        "load_cards.subtree": stats(measure(lambda: pages(roots, subtree=True), repeat), categories=len(roots)),
+    }
+
+
+def bench_items_model(repeat, rows):
+    """ItemsModel.data по всем ячейкам таблицы окна редактирования карточек"""
+    from sqlalchemy import func, select
+
+    from edit_cards import ItemsModel
+    from models import Card
+    from session import Session
+    from thumbnails import ThumbnailCache
+    from utils import api_client
+
+    # Самая наполненная категория, как в load_cards окна редактирования
+    with Session() as s:
+        category_id = s.execute(select(Card.category_id).group_by(Card.category_id)
+                                .order_by(func.count().desc()).limit(1)).scalar()
+    cards = api_client().request_cards(category_id, all=True)[:rows]
+    model = ItemsModel()
+    model.setItems(cards)
+    roles = (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.DecorationRole)
+    indexes = [model.index(row, column) for row in range(model.rowCount()) for column in range(model.columnCount())]
+
+    def read_all():
+        for index in indexes:
+            for role in roles:
+                model.data(index, role)
+
+    def read_until_ready():
+        """Превью декодируются в фоне: ждём, пока все ячейки получат картинки"""
+        read_all()
+        while model.thumbnails.pending():
+            QCoreApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 10)
+        QCoreApplication.processEvents()
+
+    thumbnails = ThumbnailCache()
+
+    def cold():
+        model.thumbnails.cancel()
+        model.thumbnails.pool.waitForDone()
+        QPixmapCache.clear()
+        shutil.rmtree(thumbnails.cache_dir, ignore_errors=True)
+        os.makedirs(thumbnails.cache_dir, exist_ok=True)
+
+    return {
+        "items_model.data.cold": stats(measure(read_all, repeat, setup=cold), rows=len(cards)),
+        "items_model.decorations_ready.cold": stats(measure(read_until_ready, repeat, setup=cold), rows=len(cards)),
+        "items_model.decorations_ready.disk": stats(measure(read_until_ready, repeat, setup=QPixmapCache.clear),
+                                                    rows=len(cards)),
+        "items_model.data.memory": stats(measure(read_all, repeat), rows=len(cards)),
+    }
+
+
+def bench_format_time(repeat, calls=100000):
+    try:
+        from player import format_time
+    except ImportError as e:
+        # QtMultimedia нужен модулю player целиком; без него замер пропускается
+        return {"player.format_time": {"skipped": str(e)}}
+    durations = [i * 997 for i in range(calls)]
+
+    def run():
+        for duration in durations:
+            format_time(duration)
+
+    return {"player.format_time": stats(measure(run, repeat), calls=calls)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.realpath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=DEFAULT_URL, help="база с каталогом")
+    parser.add_argument("--api-url", help="готовый API вместо локального")
+    parser.add_argument("--latency", type=float, default=0, help="задержка локального API, мс")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=50, help="сколько категорий запрашивать")
+    parser.add_argument("--rows", type=int, default=500, help="строк в ItemsModel")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from session import configure_engine
+    from thumbnails import ThumbnailCache
+
+    configure_engine(url=args.url)
+    server = None
+    if args.api_url:
+        os.environ["API_URL"] = args.api_url
+    else:
+        from bench.api_server import serve
+
+        server = serve(args.url, latency_ms=args.latency)
+        os.environ["API_URL"] = server.base_url
+    # Превью кладутся во временный каталог, чтобы не трогать кэш приложения
+    thumbnails_dir = tempfile.mkdtemp(prefix="bench-thumbnails-")
+    ThumbnailCache(cache_dir=thumbnails_dir)
+
+    results = {}
+    try:
+        tree_results, tree = bench_category_tree(args.repeat)
+        results.update(tree_results)
+        results.update(bench_load_cards(tree, args.repeat, args.sample))
+        results.update(bench_items_model(args.repeat, args.rows))
+        results.update(bench_format_time(args.repeat))
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(thumbnails_dir, ignore_errors=True)
+
+    report = {
+        "suite": "training-planner",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "pyside": PySide6.__version__,
+        "platform": platform.platform(),
+        "params": {
+            "url": args.url,
+            "api_url": args.api_url,
+            "latency_ms": args.latency,
+            "repeat": args.repeat,
+            "sample": args.sample,
+            "rows": args.rows,
+            "page_size": CARDS_PAGE_SIZE,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return app
+
+
+if __name__ == '__main__':
+    main()
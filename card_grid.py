@@ -0,0 +1,136 @@
+from PySide6.QtCore import Qt, QSize, QRect, QAbstractListModel, QModelIndex, QEvent, Signal
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+
+from constants import PATH_BLANK_IMG, PATH_PLAY_ICON
+from thumbnails import ThumbnailCache
+
+PREVIEW_SIZE = QSize(150, 150)
+PLAY_ICON_SIZE = QSize(40, 20)
+CARD_SIZE = QSize(180, 220)
+CARD_MARGIN = 6
+TITLE_HEIGHT = 24
+
+CardRole = Qt.ItemDataRole.UserRole + 1
+
+
+class CardsModel(QAbstractListModel):
+    """Список карточек для сетки главного окна"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = []
+        self.thumbnails = ThumbnailCache()
+
+    def setCards(self, cards):
+        self.beginResetModel()
+        self.items = list(cards)
+        self.endResetModel()
+
+    def appendCards(self, cards):
+        if not cards:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(cards) - 1)
+        self.items.extend(cards)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        card = self.items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return card["title"]
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnails.pixmap(card["preview_image_url"] or PATH_BLANK_IMG, PREVIEW_SIZE)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return card["description"]
+        if role == CardRole:
+            return card
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled
+
+
+class CardDelegate(QStyledItemDelegate):
+    """Рисует карточку: название, превью и кнопку воспроизведения"""
+    playClicked = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.play_icon = QIcon(PATH_PLAY_ICON)
+
+    def sizeHint(self, option, index) -> QSize:
+        return CARD_SIZE
+
+    @staticmethod
+    def title_rect(rect: QRect) -> QRect:
+        return QRect(rect.left() + CARD_MARGIN, rect.top() + CARD_MARGIN,
+                     rect.width() - 2 * CARD_MARGIN, TITLE_HEIGHT)
+
+    @staticmethod
+    def preview_rect(rect: QRect) -> QRect:
+        left = rect.left() + (rect.width() - PREVIEW_SIZE.width()) // 2
+        top = rect.top() + CARD_MARGIN + TITLE_HEIGHT
+        return QRect(left, top, PREVIEW_SIZE.width(), PREVIEW_SIZE.height())
+
+    @staticmethod
+    def play_rect(rect: QRect) -> QRect:
+        left = rect.left() + (rect.width() - PLAY_ICON_SIZE.width()) // 2
+        top = CardDelegate.preview_rect(rect).bottom() + CARD_MARGIN
+        return QRect(left, top, PLAY_ICON_SIZE.width(), PLAY_ICON_SIZE.height())
+
+    def paint(self, painter, option, index):
+        painter.save()
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(option.rect, option.palette.alternateBase())
+
+        title_rect = self.title_rect(option.rect)
+        title = option.fontMetrics.elidedText(index.data(Qt.ItemDataRole.DisplayRole) or "",
+                                              Qt.TextElideMode.ElideRight, title_rect.width())
+        painter.setPen(option.palette.text().color())
+        painter.drawText(title_rect, Qt.AlignmentFlag.AlignCenter, title)
+
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            painter.drawPixmap(self.preview_rect(option.rect), pixmap)
+
+        self.play_icon.paint(painter, self.play_rect(option.rect))
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and self.play_rect(option.rect).contains(event.position().toPoint())):
+            self.playClicked.emit(index.data(CardRole))
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class CardGridView(QListView):
+    """Сетка карточек: рисуются только видимые элементы,
+    число колонок подстраивается под ширину окна"""
+    playClicked = Signal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setWrapping(True)
+        self.setUniformItemSizes(True)
+        self.setSpacing(CARD_MARGIN)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setMouseTracking(True)
+        self.delegate = CardDelegate(self)
+        self.delegate.playClicked.connect(self.playClicked)
+        self.setItemDelegate(self.delegate)
@@ -0,0 +1,188 @@
+from collections import namedtuple
+
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex
+
+from metrics import timed
+
+# Категория без ORM: из локальной копии или снимка последнего запуска
+CategoryRow = namedtuple("CategoryRow", ["id", "name", "parent_id"])
+
+
+class CategoryNode:
+    """Узел дерева категорий: знает своего родителя и свою строку,
+    поэтому модели не нужно искать его в списках"""
+    __slots__ = ("id", "name", "parent_id", "category", "parent", "children", "row")
+
+    def __init__(self, category, parent=None, row=0):
+        self.id = category.id
+        self.name = category.name
+        self.parent_id = category.parent_id
+        self.category = category
+        self.parent = parent
+        self.children = []
+        self.row = row
+
+    def append(self, node):
+        node.parent = self
+        node.row = len(self.children)
+        self.children.append(node)
+
+    def __repr__(self):
+        return f"<CategoryNode(id={self.id}, name={self.name}, row={self.row})>"
+
+
+class CategoryTree:
+    """Дерево категорий: корни, узлы по id и обход в порядке дерева"""
+
+    def __init__(self, roots, by_id):
+        self.roots = roots
+        self.by_id = by_id
+
+    def __iter__(self):
+        return (node for node, _ in self.walk())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def walk(self):
+        """Узлы в порядке дерева вместе с глубиной вложенности"""
+        stack = [(node, 0) for node in reversed(self.roots)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+
+@timed("category_tree.build")
+def build_category_tree(categories) -> CategoryTree:
+    """Строим дерево за один проход по списку категорий (parent_id -> дети)"""
+    by_id = {category.id: CategoryNode(category) for category in categories}
+    roots = []
+    for node in by_id.values():
+        if node.parent_id is None:
+            node.row = len(roots)
+            roots.append(node)
+        else:
+            parent = by_id.get(node.parent_id)
+            if parent is not None:
+                parent.append(node)
+    return CategoryTree(roots, by_id)
+
+
+@timed("db.load_category_tree")
+def load_category_tree(s) -> CategoryTree:
+    """Все категории из БД одним запросом, собранные в дерево"""
+    from sqlalchemy import select
+    from models import Category
+
+    return build_category_tree(s.execute(select(Category)).scalars().all())
+
+
+def fill_category_combo(combo, tree: CategoryTree, current_id=None, empty_item=False):
+    """Заполняем выпадающий список категориями в порядке дерева с отступами"""
+    combo.clear()
+    if empty_item:
+        combo.addItem("", None)
+    for node, depth in tree.walk():
+        combo.addItem("    " * depth + node.name, node.category)
+        if node.id == current_id:
+            combo.setCurrentIndex(combo.count() - 1)
+
+
+def select_category(combo, category_id):
+    """Выбираем в списке категорию по id"""
+    for i in range(combo.count()):
+        category = combo.itemData(i)
+        if category is not None and category.id == category_id:
+            combo.setCurrentIndex(i)
+            return
+
+
+class CategoryTreeModel(QAbstractItemModel):
+    def __init__(self, root_items=None, parent=None):
+        super().__init__(parent)
+        self.root_items = root_items if root_items is not None else []
+
+    def _children(self, parent_item):
+        return parent_item.children if parent_item is not None else self.root_items
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            if parent.column() > 0:
+                return 0
+            return len(parent.internalPointer().children)
+        return len(self.root_items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            item = index.internalPointer()
+            return item.name
+        return None
+
+    def index(self, row, column, parent=QModelIndex()):
+        if column != 0 or row < 0:
+            return QModelIndex()
+        items = parent.internalPointer().children if parent.isValid() else self.root_items
+        if row >= len(items):
+            return QModelIndex()
+        return self.createIndex(row, column, items[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+
+        parent_item = index.internalPointer().parent
+        if parent_item is None:
+            return QModelIndex()
+        # Строка родителя хранится в самом узле
+        return self.createIndex(parent_item.row, 0, parent_item)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return super().flags(index) & ~Qt.ItemFlag.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if index.isValid() and role == Qt.EditRole:
+            item = index.internalPointer()
+            item.name = value
+            item.category.name = value
+            self.dataChanged.emit(index, index)
+            return True
+        return False
+
+    def addCategory(self, category, parent_index=QModelIndex()):
+        parent_item = parent_index.internalPointer() if parent_index.isValid() else None
+        siblings = self._children(parent_item)
+        node = category if isinstance(category, CategoryNode) else CategoryNode(category)
+        node.parent = parent_item
+        node.row = len(siblings)
+
+        self.beginInsertRows(parent_index, node.row, node.row)
+        siblings.append(node)
+        self.endInsertRows()
+        return self.createIndex(node.row, 0, node)
+
+    def removeCategory(self, index):
+        item = index.internalPointer()
+        siblings = self._children(item.parent)
+
+        self.beginRemoveRows(self.parent(index), item.row, item.row)
+        del siblings[item.row]
+        for row in range(item.row, len(siblings)):
+            siblings[row].row = row
+        item.parent = None
+        self.endRemoveRows()
+
+    def nodeIndex(self, node):
+        return self.createIndex(node.row, 0, node)
+
+    def getCategory(self, index):
+        if index.isValid():
+            return index.internalPointer().category
+        return None
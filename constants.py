@@ -1,4 +1,42 @@
 PATH_VIDEO = "./video/"
 PATH_IMAGES = "./images/"
 PATH_BLANK_IMG = PATH_IMAGES + "blank.png"
-PATH_PLAY_ICON = PATH_IMAGES + "play.png"
\ No newline at end of file
+PATH_PLAY_ICON = PATH_IMAGES + "play.png"
+
+PATH_CACHE = "./cache/"
+PATH_THUMBNAILS = PATH_CACHE + "thumbnails/"
+PATH_REPLICA = PATH_CACHE + "replica.sqlite3"
+PATH_SNAPSHOT = PATH_CACHE + "snapshot.json"
+# Журналы импорта папок: по ним прерванный импорт продолжается
+PATH_IMPORTS = PATH_CACHE + "imports/"
+# Лимит памяти под готовые превью (QPixmapCache), в килобайтах
+THUMBNAIL_MEMORY_LIMIT_KB = 64 * 1024
+
+# Фоновая подгрузка карточек соседних категорий
+PREFETCH_THREADS = 2
+PREFETCH_IDLE_MS = 3000
+PREFETCH_REFRESH_SEC = 300
+
+# Потоков копирования при импорте папки: упираемся в диск, а не в процессор
+IMPORT_THREADS = 4
+# Одновременных копий видео, добавленных через диалог карточки
+MEDIA_COPY_THREADS = 2
+# Одновременных процессов ffmpeg при создании превью из видео
+PREVIEW_THREADS = 2
+# Раскадровка для перемотки в плеере: файлы рядом с видео и потоки ffmpeg
+SCRUB_INDEX_SUFFIX = ".keyframes.json"
+SCRUB_SPRITES_SUFFIX = ".sprites.jpg"
+SCRUB_THREADS = 1
+# Облегчённые копии видео для просмотра: файл рядом с видео, очередь и готовые куски — в кэше.
+# Кодирование нагружает процессор, поэтому одно видео за раз
+PROXY_SUFFIX = ".proxy.mp4"
+PATH_PROXIES = PATH_CACHE + "proxies/"
+PROXY_THREADS = 1
+
+# Размер страницы при постраничной загрузке карточек
+CARDS_PAGE_SIZE = 60
+
+# Замеры производительности (--metrics или TP_METRICS=1): отчёт при выходе
+PATH_METRICS = PATH_CACHE + "metrics.json"
+# Сколько последних значений каждой операции хранится для перцентилей
+METRICS_SAMPLES = 10000
@@ -1,27 +1,29 @@
 import os.path
-import shutil
 
-from PySide6.QtCore import Qt, QSize
+from PySide6.QtCore import Qt, QRect
 from PySide6.QtGui import QPixmap
-from PySide6.QtWidgets import QDialog, QFileDialog, QMessageBox, QLineEdit
+from PySide6.QtWidgets import QDialog, QFileDialog, QMessageBox, QLineEdit, QComboBox, QDialogButtonBox, \
+    QVBoxLayout, QLabel, QProgressBar, QPushButton
 
-from constants import PATH_VIDEO, PATH_IMAGES, PATH_BLANK_IMG
-from player import Player
+from category_tree import fill_category_combo, select_category
+from constants import PATH_BLANK_IMG
+from media_store import PATH_VIDEO_STORE, media_jobs
+from previews import store_preview_image
 from ui.edit_dialog_ui import Ui_Dialog as Ui_EditCardDialog
 from ui.edit_catalog_dialog_ui import Ui_Dialog as Ui_EditCatalogDialog
-from utils import dir_scan, now_formated
 
 
 class EditCardDialog(QDialog):
     """Диалог добавления карточки"""
 
-    def __init__(self, categories, current_category, *args, **kwargs):
+    def __init__(self, category_tree, current_category, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.original_image = None
-        self.categories = categories
+        self.category_tree = category_tree
         self.current_category = current_category
         self.opened_windows = []
         self.player = None
+        self.video_job = None
         self.ui = Ui_EditCardDialog()
         self.ui.setupUi(self)
         self.ui.addButton.clicked.connect(self.accept)
@@ -32,14 +34,24 @@ class EditCardDialog(QDialog):
         self.ui.playButton.clicked.connect(lambda checked: self.open_player())
         self.ui.closeButton.clicked.connect(self.close_player)
 
-        for c in self.categories.values():
-            self.ui.cmbCategory.addItem(c.name, c)
-
-        if current_category is not None:
-            name = self.categories[self.current_category].name
-            index = self.ui.cmbCategory.findText(name)
-            if index > -1:
-                self.ui.cmbCategory.setCurrentIndex(index)
+        # Копирование видео идёт в общей очереди и не прерывается закрытием диалога;
+        # здесь только его прогресс и отмена
+        self.videoProgress = QProgressBar(self)
+        self.videoProgress.setGeometry(QRect(150, 450, 215, 26))
+        self.videoProgress.setRange(0, 1000)
+        self.videoProgress.hide()
+        self.cancelCopyButton = QPushButton("Отмена", self)
+        self.cancelCopyButton.setGeometry(QRect(370, 450, 75, 26))
+        self.cancelCopyButton.clicked.connect(self.cancel_video_copy)
+        self.cancelCopyButton.hide()
+        jobs = media_jobs()
+        jobs.progress.connect(self.on_video_progress)
+        jobs.finished.connect(self.on_video_stored)
+        jobs.failed.connect(self.on_video_error)
+        # Задача может быть общей с другим диалогом, выбравшим тот же файл, и отменить её мог он
+        jobs.cancelled.connect(self.on_video_cancelled)
+
+        fill_category_combo(self.ui.cmbCategory, self.category_tree, self.current_category)
 
     def get_data(self):
         return {
@@ -55,38 +67,66 @@ class EditCardDialog(QDialog):
         path, _ = QFileDialog.getOpenFileName(self, 'Open Video File', "",
                                               'Media Files (*.mp4 *.mkv *.amv *.m4v *.mov)')
         self.validate_not_empty(path, self.ui.linkVideoEdit)
-        file_name = os.path.basename(path)
-        now = now_formated()
-        dir_list = dir_scan(PATH_VIDEO)
-        video_dir = os.path.join(PATH_VIDEO, now)
-        if now not in dir_list:
-            os.makedirs(video_dir)
-        full_path = os.path.join(video_dir, file_name)
-        shutil.copy(path, full_path)
-        self.ui.linkVideoEdit.setText(full_path.replace("\\", "/"))
+        if not path:
+            return
+        jobs = media_jobs()
+        job_id = jobs.submit(path, PATH_VIDEO_STORE)
+        if self.video_job is not None and self.video_job != job_id:
+            # Выбрали другой файл: прежняя копия больше не нужна
+            jobs.cancel(self.video_job)
+        self.video_job = job_id
+        self.ui.addButton.setEnabled(False)
+        self.ui.linkVideoEdit.clear()
+        self.videoProgress.setFormat(f"{os.path.basename(path)}: %p%")
+        self.videoProgress.setValue(0)
+        self.videoProgress.show()
+        self.cancelCopyButton.show()
+
+    def on_video_progress(self, job_id, progress):
+        if job_id == self.video_job:
+            done, total = progress
+            self.videoProgress.setValue(done * 1000 // max(total, 1))
+
+    def on_video_stored(self, job_id, path):
+        if job_id == self.video_job:
+            self.finish_video_copy()
+            self.ui.linkVideoEdit.setText(path)
+
+    def on_video_error(self, job_id, error):
+        if job_id == self.video_job:
+            self.finish_video_copy()
+            QMessageBox.warning(self, "Выбор файла", f"Не удалось скопировать видео: {error}")
+
+    def on_video_cancelled(self, job_id):
+        if job_id == self.video_job:
+            self.finish_video_copy()
+
+    def cancel_video_copy(self):
+        """Отмена копирования; недокопированный файл хранилище удаляет само.
+        Диалог вернётся в исходное состояние по сигналу cancelled"""
+        if self.video_job is not None:
+            media_jobs().cancel(self.video_job)
+
+    def finish_video_copy(self):
+        self.video_job = None
+        self.videoProgress.hide()
+        self.cancelCopyButton.hide()
+        self.ui.addButton.setEnabled(True)
 
     def add_img_file(self):
         path, _ = QFileDialog.getOpenFileName(self, 'Open Image File', "",
                                               'Media Files (*.jpg *.jpeg *.png *.gif)')
         self.validate_not_empty(path, self.ui.linkImgEdit)
-        file_name = os.path.basename(path)
+        if not path:
+            return
         self.original_image = QPixmap(path)
-        cropped_size = QSize(150, 150)
-        scaled = self.original_image.scaled(
-            cropped_size,
-            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-            Qt.TransformationMode.SmoothTransformation
-        )
-        now = now_formated()
-        dir_list = dir_scan(PATH_IMAGES)
-        image_dir = os.path.join(PATH_IMAGES, now)
-        if now not in dir_list:
-            os.makedirs(image_dir)
-        full_path = os.path.join(image_dir, file_name)
-        scaled.save(full_path)
-        self.ui.labelForPreview.setPixmap(scaled)
+        full_path = store_preview_image(self.original_image.toImage(), os.path.splitext(path)[1])
+        if full_path is None:
+            QMessageBox.warning(self, "Выбор файла", "Не удалось прочитать картинку")
+            return
+        self.ui.labelForPreview.setPixmap(QPixmap(full_path))
         self.ui.labelForPreview.setAlignment(Qt.AlignmentFlag.AlignHCenter)
-        self.ui.linkImgEdit.setText(full_path.replace("\\", "/"))
+        self.ui.linkImgEdit.setText(full_path)
 
     def validate_not_empty(self, path: str, edit_field: QLineEdit):
         if not path and not edit_field.text():
@@ -95,10 +135,13 @@ class EditCardDialog(QDialog):
     def open_player(self):
         """Запуск плеера для предпросмотра видео, установленного в карточке"""
         if self.player is None or not self.player.isVisible():
+            # QtMultimedia загружается только при первом предпросмотре
+            from player import Player
+
             self.player = Player()
             self.player.setWindowTitle("Предварительный просмотр")
             video_path = self.get_data()["video_url"]
-            self.player.player.setSource(video_path)
+            self.player.open_video(video_path)
 
             self.player.show()
             self.player.player.play()
@@ -112,11 +155,9 @@ class EditCardDialog(QDialog):
 
 class UpdateCardDialog(EditCardDialog):
 
-    def __init__(self, categories, current_category, init_data, *args, **kwargs):
-        super().__init__(categories, current_category, *args, **kwargs)
-        category_name = categories[current_category].name
+    def __init__(self, category_tree, current_category, init_data, *args, **kwargs):
+        super().__init__(category_tree, current_category, *args, **kwargs)
         self.ui.addButton.setText("Изменить")
-        self.ui.cmbCategory.setCurrentText(category_name)
         self.ui.titleEdit.setText(str(init_data["title"]))
         self.ui.linkImgEdit.setText(str(init_data["preview_image_url"]))
         self.ui.linkVideoEdit.setText(str(init_data["video_url"]))
@@ -125,19 +166,37 @@ class UpdateCardDialog(EditCardDialog):
         self.ui.labelForPreview.setPixmap(QPixmap(init_data["preview_image_url"] or PATH_BLANK_IMG))
 
 
+class MoveCardsDialog(QDialog):
+    """Диалог выбора категории, в которую переносятся выделенные карточки"""
+
+    def __init__(self, category_tree, current_category, count, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setWindowTitle("Перенос карточек")
+        self.category = QComboBox()
+        fill_category_combo(self.category, category_tree, current_category)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Перенести карточки ({count}) в категорию:"))
+        layout.addWidget(self.category)
+        layout.addWidget(buttons)
+
+    def get_category_id(self):
+        return self.category.currentData().id
+
+
 class EditCatalogDialog(QDialog):
     """Диалог добавления категории"""
 
-    def __init__(self, categories, *args, **kwargs):
+    def __init__(self, category_tree, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.categories = categories
+        self.category_tree = category_tree
         self.ui = Ui_EditCatalogDialog()
         self.ui.setupUi(self)
         self.ui.addButton.clicked.connect(self.accept)
         self.ui.cancelButton.clicked.connect(self.reject)
-        self.ui.assignParentCategory.addItem("", None)
-        for c in self.categories.values():
-            self.ui.assignParentCategory.addItem(c.name, c)
+        fill_category_combo(self.ui.assignParentCategory, self.category_tree, empty_item=True)
 
     def get_data(self):
         try:
@@ -153,17 +212,11 @@ class EditCatalogDialog(QDialog):
 class UpdateCatalogDialog(EditCatalogDialog):
     """Диалог изменения категории"""
 
-    def __init__(self, categories, init_data, *args, **kwargs):
-        super().__init__(categories, *args, **kwargs)
-        category_name = init_data.name
-        category_parent = init_data.parent_id
-        if category_parent is not None:
-            name = categories[category_parent].name
-        else:
-            name = None
+    def __init__(self, category_tree, init_data, *args, **kwargs):
+        super().__init__(category_tree, *args, **kwargs)
+        select_category(self.ui.assignParentCategory, init_data.parent_id)
         self.ui.addButton.setText("Изменить")
-        self.ui.titleEdit.setText(category_name)
-        self.ui.assignParentCategory.setCurrentText(name)
+        self.ui.titleEdit.setText(init_data.name)
 
 
 if __name__ == '__main__':
@@ -1,35 +1,181 @@
 import os
-from pathlib import Path
+from bisect import bisect_left
+from uuid import UUID
 
-from PySide6.QtCore import Qt, QModelIndex, QAbstractTableModel, Signal, QSize
+from PySide6.QtCore import Qt, QModelIndex, QAbstractTableModel, Signal, QSize, QThreadPool, QTimer
 from PySide6 import QtWidgets
-from PySide6.QtGui import QPixmap
+from PySide6.QtGui import QKeySequence
 from PySide6.QtWidgets import QMainWindow, \
-    QMessageBox, QAbstractItemView
-from sqlalchemy import select, update, insert, delete
+    QMessageBox, QAbstractItemView, QFileDialog, QProgressDialog
+from sqlalchemy import update, insert, delete
 
-from models import Card, Category
+from category_tree import load_category_tree, fill_category_combo
+from constants import PATH_BLANK_IMG
+from models import Card
 from ui.edit_ui import Ui_MainWindow
-from dialogs import EditCardDialog, UpdateCardDialog
+from dialogs import EditCardDialog, UpdateCardDialog, MoveCardsDialog
+from media_store import acquire, release, remove_files, sweep_unclaimed
+from metrics import timed
+from previews import preview_jobs, missing_previews
+from proxies import proxy_jobs, all_videos
+from scrub import scrub_jobs
 from session import session
-from utils import request_cards
+from thumbnails import ThumbnailCache, ThumbnailLoader
+from utils import request_cards, api_client
+from workers import Worker
+
+
+PREVIEW_SIZE = QSize(50, 50)
+PREVIEW_COLUMN = 2
+# Столбец превью постоянной ширины: подгонка по содержимому пересчитывала бы все строки на каждое превью
+PREVIEW_COLUMN_WIDTH = PREVIEW_SIZE.width() + 10
+# Готовые превью копятся столько мс и обновляют таблицу одним сигналом
+THUMBNAIL_BATCH_MS = 50
+# Поля карточки, которые хранит таблица
+CARD_FIELDS = ("id", "title", "preview_image_url", "video_url", "description", "invisible")
+
+
+def increasing_subsequence(values) -> list[int]:
+    """Индексы наибольшей возрастающей подпоследовательности values, O(n log n)"""
+    tails, tail_values = [], []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        k = bisect_left(tail_values, value)
+        if k:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+    result = []
+    i = tails[-1] if tails else -1
+    while i != -1:
+        result.append(i)
+        i = previous[i]
+    return result[::-1]
+
+
+def delete_cards(ids) -> list[str]:
+    """Удаляем карточки одним запросом в одной транзакции.
+    Возвращаем файлы превью и видео, на которые больше не ссылается ни одна карточка"""
+    ids = [UUID(str(id_)) for id_ in ids]
+    with session as s:
+        rows = s.execute(delete(Card).where(Card.id.in_(ids))
+                         .returning(Card.preview_image_url, Card.video_url)).all()
+        # Один файл может быть у нескольких карточек — счётчик ссылок знает, чей он ещё
+        orphaned = release(s, [path for row in rows for path in row])
+        s.commit()
+    return orphaned
+
+
+def move_cards(ids, category_id):
+    """Переносим карточки в другую категорию одним запросом"""
+    with session as s:
+        s.execute(update(Card).where(Card.id.in_([UUID(str(id_)) for id_ in ids])).values(category_id=category_id))
+        s.commit()
+
+
+def set_cards_invisible(ids, invisible):
+    """Скрываем или показываем карточки одним запросом"""
+    with session as s:
+        s.execute(update(Card).where(Card.id.in_([UUID(str(id_)) for id_ in ids])).values(invisible=invisible))
+        s.commit()
 
 
 class ItemsModel(QAbstractTableModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.items = []
+        # Строки по пути превью: готовое превью обновляет свои ячейки без обхода всей таблицы
+        self.rows_by_preview = {}
         self.headers = ["Номер", "Название", "Ссылка не превью", "Ссылка на видео", "Скрыть"]
+        # Превью декодируются в фоне; пока их нет, в ячейке заглушка
+        self.thumbnails = ThumbnailLoader(PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatio, self)
+        self.thumbnails.ready.connect(self.on_thumbnail_ready)
+        self.ready_previews = set()
+        self.ready_timer = QTimer(self)
+        self.ready_timer.setSingleShot(True)
+        self.ready_timer.setInterval(THUMBNAIL_BATCH_MS)
+        self.ready_timer.timeout.connect(self.update_previews)
+        self.placeholder = ThumbnailCache().pixmap(PATH_BLANK_IMG, PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
 
     def setItems(self, items):
+        self.thumbnails.cancel()
         self.beginResetModel()
         self.items = items
+        self.index_previews()
         self.endResetModel()
 
-    def rowCount(self, *args, **kwargs) -> int:
+    def updateItems(self, items):
+        """Приводим таблицу к новому списку точечно, сопоставляя строки по id карточки:
+        удаления, вставки и перемещения строк, dataChanged только для изменившихся.
+        Выделение и прокрутка при этом сохраняются"""
+        new_ids = {item["id"] for item in items}
+        row = len(self.items) - 1
+        while row >= 0:
+            if self.items[row]["id"] in new_ids:
+                row -= 1
+                continue
+            # Подряд идущие удалённые строки убираем одним диапазоном
+            first = row
+            while first > 0 and self.items[first - 1]["id"] not in new_ids:
+                first -= 1
+            self.beginRemoveRows(QModelIndex(), first, row)
+            del self.items[first:row + 1]
+            self.endRemoveRows()
+            row = first - 1
+
+        # Строки, сохранившие взаимный порядок (наибольшая возрастающая
+        # подпоследовательность позиций в новом списке), остаются на месте;
+        # переносятся только остальные
+        position = {item["id"]: i for i, item in enumerate(items)}
+        stable = {self.items[i]["id"] for i in increasing_subsequence([position[item["id"]] for item in self.items])}
+        present = {item["id"] for item in self.items}
+        row = 0
+        while row < len(items):
+            item = items[row]
+            if row < len(self.items) and self.items[row]["id"] == item["id"]:
+                if self.items[row] != item:
+                    self.items[row] = item
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+                row += 1
+            elif item["id"] not in present:
+                last = row
+                while last + 1 < len(items) and items[last + 1]["id"] not in present:
+                    last += 1
+                self.beginInsertRows(QModelIndex(), row, last)
+                self.items[row:row] = items[row:last + 1]
+                self.endInsertRows()
+                row = last + 1
+            elif item["id"] in stable:
+                # На месте стоит строка, которой место ниже: убираем её в конец,
+                # на своё место она встанет, когда до неё дойдёт очередь
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), len(self.items))
+                self.items.append(self.items.pop(row))
+                self.endMoveRows()
+            else:
+                # Строка сменила место (например, после переименования) — переносим её
+                source = next(i for i in range(row + 1, len(self.items)) if self.items[i]["id"] == item["id"])
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), row)
+                self.items.insert(row, self.items.pop(source))
+                self.endMoveRows()
+        self.index_previews()
+
+    def index_previews(self):
+        self.rows_by_preview = {}
+        for row, info in enumerate(self.items):
+            self.rows_by_preview.setdefault(str(info["preview_image_url"]), []).append(row)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
         return len(self.items)
 
-    def columnCount(self, *args, **kwargs) -> int:
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
         return len(self.headers)
 
     def data(self, index: QModelIndex, role: Qt.ItemDataRole):
@@ -48,15 +194,29 @@ class ItemsModel(QAbstractTableModel):
             #     return f"{info.invisible}" or "empty"
 
         if role == Qt.ItemDataRole.DecorationRole:
-            if col == 2:
-                path = Path(str(info["preview_image_url"]))
-                pixmap = QPixmap(path)
+            if col == PREVIEW_COLUMN:
+                pixmap = self.thumbnails.pixmap(str(info["preview_image_url"]))
+                if pixmap is None:
+                    return self.placeholder
                 if not pixmap.isNull():
-                    return pixmap.scaled(50, 50, Qt.AspectRatioMode.KeepAspectRatio,
-                                         Qt.TransformationMode.SmoothTransformation)
+                    return pixmap
             return "empty"
         return None
 
+    def on_thumbnail_ready(self, path):
+        """Превью приходят по одному; копим их и обновляем таблицу пачкой"""
+        self.ready_previews.add(path)
+        if not self.ready_timer.isActive():
+            self.ready_timer.start()
+
+    def update_previews(self):
+        """Один dataChanged на пачку: от первой до последней строки с готовыми превью"""
+        rows = [row for path in self.ready_previews for row in self.rows_by_preview.get(path, ())]
+        self.ready_previews.clear()
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), PREVIEW_COLUMN), self.index(max(rows), PREVIEW_COLUMN),
+                                  [Qt.ItemDataRole.DecorationRole])
+
     def headerData(self, section: int, orientation: Qt.Orientation, role: Qt.ItemDataRole):
         if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
             return self.headers[section]
@@ -87,8 +247,10 @@ class ItemsModel(QAbstractTableModel):
 
     def removeRow(self, row):
         if 0 <= row < len(self.items):
+            self.beginRemoveRows(QModelIndex(), row, row)
             self.items.pop(row)
-            self.layoutChanged.emit()
+            self.index_previews()
+            self.endRemoveRows()
 
 
 class EditCardsWindow(QMainWindow):
@@ -97,15 +259,57 @@ class EditCardsWindow(QMainWindow):
     def __init__(self, current_category):
         super(EditCardsWindow, self).__init__()
         self.categories = {}
-        self.rows = []
+        self.category_tree = None
         self.current_category = current_category
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         self.model = ItemsModel()
         self.ui.tableView.setModel(self.model)
-        self.ui.tableView.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
-        self.ui.tableView.horizontalHeader().setStretchLastSection(True)
+        header = self.ui.tableView.horizontalHeader()
+        header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(PREVIEW_COLUMN, QtWidgets.QHeaderView.ResizeMode.Fixed)
+        header.resizeSection(PREVIEW_COLUMN, PREVIEW_COLUMN_WIDTH)
+        header.setStretchLastSection(True)
         self.ui.tableView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.ui.tableView.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        # Действия над выделенными карточками: в меню окна и в контекстном меню таблицы
+        self.cardsMenu = self.ui.menubar.addMenu("Карточки")
+        self.removeAction = self.cardsMenu.addAction("Удалить", self.on_buttonRemove_click)
+        self.removeAction.setShortcut(QKeySequence.StandardKey.Delete)
+        self.moveAction = self.cardsMenu.addAction("Перенести в категорию…", self.move_selected)
+        self.hideAction = self.cardsMenu.addAction("Скрыть", lambda: self.set_selected_invisible(True))
+        self.showAction = self.cardsMenu.addAction("Показать", lambda: self.set_selected_invisible(False))
+        self.ui.tableView.addActions(self.cardsMenu.actions())
+        self.ui.tableView.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+        self.cardsMenu.addSeparator()
+        self.importAction = self.cardsMenu.addAction("Импорт папки…", self.import_folder)
+        self.importer = None
+        self.import_progress = None
+        self.previewsAction = self.cardsMenu.addAction("Создать недостающие превью", self.regenerate_previews)
+        self.stopPreviewsAction = self.cardsMenu.addAction("Остановить создание превью",
+                                                           lambda: preview_jobs().cancel())
+        self.missing_worker = None
+        self.proxiesAction = self.cardsMenu.addAction("Создать облегчённые копии видео", self.make_proxies)
+        self.stopProxiesAction = self.cardsMenu.addAction("Остановить создание копий", lambda: proxy_jobs().cancel())
+        self.videos_worker = None
+        # Превью из кадров приходят по одному: таблицу перечитываем не чаще раза в секунду
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(1000)
+        self.reload_timer.timeout.connect(self.refresh_cards)
+        # Очереди общие на приложение и переживают окно: в closeEvent от них отключаемся
+        self.job_connections = [
+            (preview_jobs().ready, self.on_preview_ready),
+            (preview_jobs().progress, self.on_previews_progress),
+            (preview_jobs().finished, self.on_previews_finished),
+            (proxy_jobs().progress, self.on_proxies_progress),
+            (proxy_jobs().finished, self.on_proxies_finished),
+        ]
+        for signal, slot in self.job_connections:
+            signal.connect(slot)
+        # Файлы, положенные в хранилище, но так и не попавшие в карточки (диалог отменили,
+        # импорт пропустил дубль), удаляем в фоне
+        QThreadPool.globalInstance().start(Worker(sweep_unclaimed))
         self.load_catalog()
         self.load_cards()
         self.ui.comboBox.currentIndexChanged.connect(self.load_cards)
@@ -114,44 +318,27 @@ class EditCardsWindow(QMainWindow):
         self.ui.buttonEdit.clicked.connect(self.on_buttonEdit_click)
         self.ui.buttonExit.clicked.connect(self.on_buttonExit_click)
 
+    @timed("edit_cards.load_cards")
     def load_cards(self):
-        self.ui.tableView.model().items.clear()
         category_id = self.ui.comboBox.currentData().id
         cards = request_cards(category_id, all=True)
-        for card in cards:
-            row = dict()
-            row["id"] = card["id"]
-            row["title"] = card["title"]
-            row["preview_image_url"] = card["preview_image_url"]
-            row["video_url"] = card["video_url"]
-            row["description"] = card["description"]
-            row["invisible"] = card["invisible"]
-            self.rows.append(row)
-        self.model.setItems(self.rows)
+        rows = [{field: card[field] for field in CARD_FIELDS} for card in cards]
+        if category_id == self.current_category and self.model.items:
+            # Та же категория после правки: меняем только затронутые строки
+            self.model.updateItems(rows)
+        else:
+            self.model.setItems(rows)
         self.current_category = category_id
 
+    @timed("edit_cards.load_catalog")
     def load_catalog(self):
-        self.ui.comboBox.clear()
-        self.categories = {}
         with session as s:
-            # ToDo повторяющееся выборка категорий
-            query = select(Category)
-            result = s.execute(query)
-            rows = result.scalars().all()
-            for r in rows:
-                self.categories[r.id] = r
-
-        for category in self.categories.values():
-            self.ui.comboBox.addItem(category.name, category)
-
-        if self.current_category is not None:
-            name = self.categories[self.current_category].name
-            index = self.ui.comboBox.findText(name)
-            if index > -1:
-                self.ui.comboBox.setCurrentIndex(index)
+            self.category_tree = load_category_tree(s)
+        self.categories = {node.id: node.category for node in self.category_tree}
+        fill_category_combo(self.ui.comboBox, self.category_tree, self.current_category)
 
     def on_buttonAdd_click(self):
-        dialog = EditCardDialog(self.categories, self.current_category)
+        dialog = EditCardDialog(self.category_tree, self.current_category)
         dialog.move(100, 100)
         result = dialog.exec()
 
@@ -160,41 +347,66 @@ class EditCardsWindow(QMainWindow):
         data = dialog.get_data()
 
         with session as s:
-            query = insert(Card)
-            s.execute(query, data)
+            query = insert(Card).returning(Card.id)
+            card_id = s.execute(query, data).scalar()
+            acquire(s, [data["video_url"], data["preview_image_url"]])
             s.commit()
+        if not data["preview_image_url"]:
+            # Картинку не выбрали — превью сделается из кадра видео в фоне
+            preview_jobs().submit(card_id, data["video_url"], data["preview_image_url"])
+        # Раскадровка для перемотки в плеере — заранее, чтобы не ждать её при первом просмотре
+        scrub_jobs().submit(data["video_url"])
+        proxy_jobs().submit(data["video_url"])
+        api_client().invalidate("/api/cards")
         self.load_cards()
 
+    def selected_items(self) -> list[dict]:
+        """Карточки выделенных строк в порядке таблицы"""
+        rows = sorted(index.row() for index in self.ui.tableView.selectionModel().selectedRows())
+        return [self.model.items[row] for row in rows if self.model.items[row]["id"] is not None]
+
     def on_buttonRemove_click(self):
-        selected = self.ui.tableView.selectedIndexes()
-        if not selected:
+        items = self.selected_items()
+        if not items:
             QMessageBox.warning(self, "Ошибка", "Выберите карточку для удаления!")
             return
 
-        row = selected[0].row()
-        item = self.ui.tableView.model().items[row]
-        if item["id"] is None:
-            return
-
-        result = QMessageBox.question(self, "Подтверждение",
-                                      "Точно хотите удалить карточку?")
+        question = "Точно хотите удалить карточку?" if len(items) == 1 \
+            else f"Точно хотите удалить карточки ({len(items)})?"
+        result = QMessageBox.question(self, "Подтверждение", question)
         if result == QMessageBox.StandardButton.No:
             return
 
-        with session as s:
-            card = self.rows[row]
-            query = delete(Card).where(Card.id == card["id"])
-            s.execute(query)
-            s.commit()
+        orphaned = delete_cards([item["id"] for item in items])
+        if orphaned:
+            # Файлы удаляются в фоне, окно сразу показывает обновлённый список
+            QThreadPool.globalInstance().start(Worker(remove_files, orphaned))
 
-        preview = item["preview_image_url"]
-        if preview and Path(preview).exists():
-            os.remove(item["preview_image_url"])
+        api_client().invalidate("/api/cards")
+        self.load_cards()
 
-        video = item["video_url"]
-        if video and Path(video).exists():
-            os.remove(video)
+    def move_selected(self):
+        items = self.selected_items()
+        if not items:
+            QMessageBox.warning(self, "Перенос карточек", "Не выбрано ни одной карточки")
+            return
 
+        dialog = MoveCardsDialog(self.category_tree, self.current_category, len(items), self)
+        if dialog.exec() == 0:
+            return
+        category_id = dialog.get_category_id()
+        if category_id == self.current_category:
+            return
+        move_cards([item["id"] for item in items], category_id)
+        api_client().invalidate("/api/cards")
+        self.load_cards()
+
+    def set_selected_invisible(self, invisible):
+        items = [item for item in self.selected_items() if item["invisible"] != invisible]
+        if not items:
+            return
+        set_cards_invisible([item["id"] for item in items], invisible)
+        api_client().invalidate("/api/cards")
         self.load_cards()
 
     def on_buttonEdit_click(self):
@@ -208,23 +420,165 @@ class EditCardsWindow(QMainWindow):
             )
             return
 
-        row = selected[0].row()
-        item = self.ui.tableView.model().items[row]
+        items = self.selected_items()
+        if len(items) > 1:
+            QMessageBox.warning(
+                self,
+                "Редактирование карточки",
+                "Выберите одну карточку; для выделенных доступны перенос, скрытие и удаление в меню «Карточки»",
+                QMessageBox.StandardButton.Yes
+            )
+            return
+        item = items[0] if items else None
         if not item:
             return
 
-        dialog = UpdateCardDialog(self.categories, self.current_category, item)
+        dialog = UpdateCardDialog(self.category_tree, self.current_category, item)
 
         result = dialog.exec()
         if result == 0:
             return
         data = dialog.get_data()
+        old_paths = [item["video_url"], item["preview_image_url"]]
+        new_paths = [data["video_url"], data["preview_image_url"]]
         with session as s:
             query = update(Card).where(Card.id.in_([item["id"]]))
             s.execute(query, data)
+            # Файл, заменённый в карточке, удаляется, если больше ни у кого его нет
+            acquire(s, [path for path in new_paths if path not in old_paths])
+            orphaned = release(s, [path for path in old_paths if path not in new_paths])
             s.commit()
+        if orphaned:
+            QThreadPool.globalInstance().start(Worker(remove_files, orphaned))
+        api_client().invalidate("/api/cards")
+        self.load_cards()
+
+    def import_folder(self):
+        """Папка с видео становится подкатегорией текущей категории, видео — карточками"""
+        if self.importer is not None and self.importer.running():
+            return
+        root = QFileDialog.getExistingDirectory(self, "Папка с видео")
+        if not root:
+            return
+        category = self.categories.get(self.current_category)
+        name = category.name if category is not None else ""
+        result = QMessageBox.question(self, "Импорт папки",
+                                      f"Папка «{os.path.basename(root)}» со всеми подпапками станет "
+                                      f"подкатегорией «{name}». Продолжить?")
+        if result == QMessageBox.StandardButton.No:
+            return
+
+        # Модуль импорта нужен только здесь
+        from folder_import import FolderImporter
+
+        self.importer = FolderImporter(self)
+        self.importer.planned.connect(self.on_import_planned)
+        self.importer.progress.connect(lambda done, total: self.import_progress.setValue(done))
+        self.importer.finished.connect(self.on_import_finished)
+        self.importer.error.connect(self.on_import_error)
+        self.import_progress = QProgressDialog("Импорт папки…", "Отмена", 0, 0, self)
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(0)
+        self.import_progress.setAutoReset(False)
+        self.import_progress.canceled.connect(self.on_import_canceled)
+        self.import_progress.show()
+        self.importer.start(root, self.category_tree, self.current_category)
+
+    def on_import_planned(self, total):
+        self.import_progress.setLabelText(f"Копирование файлов: {total}")
+        self.import_progress.setMaximum(max(total, 1))
+
+    def on_import_canceled(self):
+        self.importer.cancel()
+        QMessageBox.information(self, "Импорт папки",
+                                "Импорт остановлен. Выберите ту же папку ещё раз, чтобы продолжить его")
+
+    def on_import_finished(self, count, failed):
+        self.import_progress.reset()
+        api_client().invalidate("/api/cards")
+        self.reload_catalog()
+        message = f"Добавлено карточек: {count}"
+        if failed:
+            message += f"\nНе удалось скопировать ({len(failed)}):\n" + "\n".join(failed[:10])
+        QMessageBox.information(self, "Импорт папки", message)
+
+    def on_import_error(self, error):
+        self.import_progress.reset()
+        self.importer.cancel()
+        QMessageBox.warning(self, "Импорт папки", f"Импорт не удался: {error}")
+
+    def regenerate_previews(self):
+        """Превью из кадров для карточек, у которых его нет или файл превью потерян"""
+        if not preview_jobs().available():
+            QMessageBox.warning(self, "Превью", "Для превью из кадров нужен ffmpeg (в PATH или в переменной "
+                                                "окружения FFMPEG) или модуль QtMultimedia")
+            return
+        self.statusBar().showMessage("Поиск карточек без превью…")
+        self.missing_worker = Worker(missing_previews)
+        self.missing_worker.signals.result.connect(self.on_missing_previews)
+        QThreadPool.globalInstance().start(self.missing_worker)
+
+    def on_missing_previews(self, cards):
+        if not cards:
+            self.statusBar().showMessage("Превью есть у всех карточек", 5000)
+            return
+        jobs = preview_jobs()
+        for card_id, video_url, preview in cards:
+            jobs.submit(card_id, video_url, preview)
+
+    def make_proxies(self):
+        """Облегчённые копии для всех видео каталога; уже готовые пропускаются"""
+        if not proxy_jobs().available():
+            QMessageBox.warning(self, "Копии видео", "Для облегчённых копий нужен ffmpeg (в PATH или в "
+                                                     "переменной окружения FFMPEG)")
+            return
+        self.statusBar().showMessage("Поиск видео…")
+        self.videos_worker = Worker(all_videos)
+        self.videos_worker.signals.result.connect(self.on_all_videos)
+        QThreadPool.globalInstance().start(self.videos_worker)
+
+    def on_all_videos(self, videos):
+        jobs = proxy_jobs()
+        for video_path in videos:
+            jobs.submit(video_path)
+        if not jobs.pending():
+            self.statusBar().showMessage("Копии есть у всех видео", 5000)
+
+    def on_preview_ready(self, card_id, path):
+        self.reload_timer.start()
+
+    def on_previews_progress(self, done, total):
+        self.statusBar().showMessage(f"Превью: {done} из {total}")
+
+    def on_previews_finished(self):
+        self.statusBar().showMessage("Превью готовы", 5000)
+
+    def on_proxies_progress(self, done, total):
+        self.statusBar().showMessage(f"Копии видео: {done} из {total}")
+
+    def on_proxies_finished(self):
+        self.statusBar().showMessage("Копии видео готовы", 5000)
+
+    def refresh_cards(self):
+        api_client().invalidate("/api/cards")
         self.load_cards()
 
+    def reload_catalog(self):
+        """Перечитываем категории, не дёргая load_cards на каждом шаге заполнения списка"""
+        self.ui.comboBox.blockSignals(True)
+        try:
+            self.load_catalog()
+        finally:
+            self.ui.comboBox.blockSignals(False)
+        self.load_cards()
+
+    def closeEvent(self, event):
+        for signal, slot in self.job_connections:
+            signal.disconnect(slot)
+        self.job_connections = []
+        self.reload_timer.stop()
+        super().closeEvent(event)
+
     def on_buttonExit_click(self):
         self.exitButtonClicked.emit()
         self.close()
@@ -1,12 +1,14 @@
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
 from PySide6.QtWidgets import QMainWindow, QMessageBox, QAbstractItemView
 from PySide6 import QtWidgets
-from sqlalchemy import select, insert, update
+from sqlalchemy import insert, update
 
+from category_tree import load_category_tree
 from models import Category
 from ui.edit_catalog_ui import Ui_MainWindow
 from session import session
 from dialogs import EditCatalogDialog, UpdateCatalogDialog
+from metrics import timed
 
 
 class ItemsModel(QAbstractTableModel):
@@ -73,6 +75,7 @@ class EditCatalogWindow(QMainWindow):
     def __init__(self):
         super(EditCatalogWindow, self).__init__()
         self.categories = {}
+        self.category_tree = None
         self.rows = []
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
@@ -87,18 +90,14 @@ class EditCatalogWindow(QMainWindow):
         self.ui.buttonExit.clicked.connect(self.on_buttonExit_click)
         self.load_catalog()
 
+    @timed("edit_catalog.load_catalog")
     def load_catalog(self):
         self.ui.tableView.model().items.clear()
-        self.categories = {}
         with session as s:
-            query = select(Category)
-            result = s.execute(query)
-            rows = result.scalars().all()
-            for r in rows:
-                self.categories[r.id] = r
-
-        for category in self.categories.values():
-            self.rows.append(category)
+            self.category_tree = load_category_tree(s)
+        self.categories = {node.id: node.category for node in self.category_tree}
+        # Строки таблицы — узлы дерева: имя родителя берём из узла, без ленивой загрузки
+        self.rows.extend(self.category_tree)
         self.model.setItems(self.rows)
 
     def on_buttonExit_click(self):
@@ -107,7 +106,7 @@ class EditCatalogWindow(QMainWindow):
         self.close()
 
     def on_buttonAdd_click(self):
-        dialog = EditCatalogDialog(self.categories)
+        dialog = EditCatalogDialog(self.category_tree)
         result = dialog.exec()
 
         if result == 0:
@@ -160,7 +159,7 @@ class EditCatalogWindow(QMainWindow):
         if not item:
             return
 
-        dialog = UpdateCatalogDialog(self.categories, item)
+        dialog = UpdateCatalogDialog(self.category_tree, item)
         result = dialog.exec()
         if result == 0:
             return
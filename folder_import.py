@@ -0,0 +1,279 @@
+"""Импорт папки с видео: папка и её подпапки становятся категориями, видеофайлы — карточками.
+
+Картинка рядом с видео с тем же именем (lesson.mp4 и lesson.jpg) становится
+превью карточки, а без неё превью делается из кадра видео (previews).
+Файлы копируются в хранилище медиа (media_store) пулом потоков, превью
+уменьшаются там же, а строки пишутся в БД одной транзакцией
+в самом конце.
+
+План импорта сохраняется в журнал (cache/imports/) до начала копирования.
+Если импорт отменили или приложение закрылось, тот же импорт продолжается
+по журналу: файлы, которые уже есть в хранилище, повторно не копируются.
+"""
+import hashlib
+import json
+import os
+import uuid
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
+from PySide6.QtGui import QImage
+
+from constants import PATH_IMPORTS, IMPORT_THREADS
+from media_store import PATH_VIDEO_STORE, put_file, acquire
+from previews import preview_jobs, store_preview_image
+from proxies import proxy_jobs
+from scrub import scrub_jobs
+from workers import Worker
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".amv", ".m4v", ".mov")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+
+
+def journal_path(root, parent_id) -> str:
+    """Журнал один на пару «папка — родительская категория»"""
+    key = f"{os.path.abspath(root)}|{parent_id}".encode()
+    return os.path.join(PATH_IMPORTS, hashlib.sha1(key).hexdigest() + ".json")
+
+
+def load_journal(root, parent_id) -> dict | None:
+    """План прерванного импорта; None, если его нет или он повреждён"""
+    try:
+        with open(journal_path(root, parent_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_journal(plan):
+    path = journal_path(plan["root"], plan["parent_id"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def remove_journal(plan):
+    try:
+        os.remove(journal_path(plan["root"], plan["parent_id"]))
+    except FileNotFoundError:
+        pass
+
+
+def _child_ids(category_tree, parent_id) -> dict[str, str]:
+    """Существующие подкатегории по имени: повторный импорт не плодит дубли.
+    У категорий, созданных этим же импортом, в дереве детей нет"""
+    if parent_id is None:
+        nodes = category_tree.roots
+    else:
+        node = category_tree.by_id.get(uuid.UUID(parent_id))
+        nodes = node.children if node is not None else []
+    return {node.name: str(node.id) for node in nodes}
+
+
+def _find_preview(directory, stem, files):
+    for extension in IMAGE_EXTENSIONS:
+        for name in (stem + extension, stem + extension.upper()):
+            if name in files:
+                return os.path.join(directory, name)
+    return None
+
+
+def plan_import(root, category_tree, parent_id=None) -> dict:
+    """План импорта: новые категории и карточки с путями, куда лягут их файлы.
+    Продолжаем прерванный импорт той же папки, если его журнал на месте"""
+    root = os.path.abspath(root)
+    parent_id = str(parent_id) if parent_id is not None else None
+    plan = load_journal(root, parent_id)
+    if plan is not None:
+        return plan
+
+    base = os.path.basename(root.rstrip(os.sep)) or root
+    categories, cards = [], []
+    category_ids = {}
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        relative = os.path.relpath(directory, root)
+        name = base if relative == os.curdir else os.path.basename(directory)
+        owner = parent_id if relative == os.curdir else category_ids[os.path.dirname(directory)]
+        category_id = _child_ids(category_tree, owner).get(name)
+        if category_id is None:
+            category_id = str(uuid.uuid4())
+            categories.append({"id": category_id, "name": name, "parent_id": owner})
+        category_ids[directory] = category_id
+
+        files = set(files)
+        for file_name in sorted(files):
+            stem, extension = os.path.splitext(file_name)
+            if extension.lower() not in VIDEO_EXTENSIONS:
+                continue
+            cards.append({
+                "id": str(uuid.uuid4()),
+                "title": stem,
+                "category_id": category_id,
+                "source": os.path.join(directory, file_name),
+                "preview_source": _find_preview(directory, stem, files),
+                # Пути в хранилище известны после копирования; журнал запоминает их при отмене
+                "video_url": None,
+                "preview_image_url": None,
+            })
+
+    plan = {"root": root, "parent_id": parent_id, "categories": categories, "cards": cards}
+    save_journal(plan)
+    return plan
+
+
+def import_file(card):
+    """Кладём видео карточки в хранилище и уменьшаем превью. Генератор: прогресс
+    копирования в байтах, результат — карточка с путями в хранилище.
+    Файлы, уже скопированные до отмены, пропускаем"""
+    if card["video_url"] and os.path.exists(card["video_url"]):
+        return card
+    video_url = yield from put_file(card["source"], PATH_VIDEO_STORE)
+    preview = None
+    if card["preview_source"]:
+        preview = store_preview_image(QImage(card["preview_source"]), os.path.splitext(card["preview_source"])[1])
+    return dict(card, video_url=video_url, preview_image_url=preview)
+
+
+def insert_import(plan, cards) -> list[dict]:
+    """Новые категории и карточки одной транзакцией, пачками через executemany.
+    Строки, уже записанные прошлым запуском или прошлым импортом, пропускаем"""
+    from sqlalchemy import insert, select
+
+    from models import Card, Category
+    from session import Session
+
+    with Session() as s:
+        category_ids = [uuid.UUID(row["id"]) for row in plan["categories"]]
+        known = set(s.execute(select(Category.id).where(Category.id.in_(category_ids))).scalars()) \
+            if category_ids else set()
+        categories = [{
+            "id": uuid.UUID(row["id"]),
+            "name": row["name"],
+            "parent_id": uuid.UUID(row["parent_id"]) if row["parent_id"] else None,
+        } for row in plan["categories"] if uuid.UUID(row["id"]) not in known]
+        # Путь в хранилище — хэш содержимого: то же видео уже есть в каталоге
+        # (например, импорт записан раньше) — второй раз не добавляем
+        video_urls = [card["video_url"] for card in cards]
+        known = set(s.execute(select(Card.video_url).where(Card.video_url.in_(video_urls))).scalars()) \
+            if video_urls else set()
+        rows = [{
+            "id": uuid.UUID(card["id"]),
+            "title": card["title"],
+            "preview_image_url": card["preview_image_url"],
+            "video_url": card["video_url"],
+            "category_id": uuid.UUID(card["category_id"]),
+            "invisible": False,
+            "description": "",
+        } for card in cards if card["video_url"] not in known]
+        # Категории в порядке обхода папок: родитель всегда раньше детей
+        if categories:
+            s.execute(insert(Category), categories)
+        if rows:
+            s.execute(insert(Card), rows)
+            acquire(s, [row[field] for row in rows for field in ("video_url", "preview_image_url")])
+        s.commit()
+    return rows
+
+
+class FolderImporter(QObject):
+    """Импорт папки в фоне: план, копирование файлов пулом потоков, запись в БД.
+
+    progress(готово, всего) приходит по мере копирования, finished(добавлено
+    карточек, список не скопированных файлов) — после записи в БД.
+    После cancel() доделываются только уже начатые копии, а журнал остаётся
+    для продолжения.
+    """
+    planned = Signal(int)
+    progress = Signal(int, int)
+    finished = Signal(int, list)
+    error = Signal(object)
+
+    def __init__(self, parent=None, max_threads=IMPORT_THREADS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.plan = None
+        self._workers = []
+        self._pending = 0
+        self._done = []
+        self._failed = []
+        self._cancelled = False
+
+    def start(self, root, category_tree, parent_id=None):
+        self._cancelled = False
+        self._run(Worker(plan_import, root, category_tree, parent_id), self._on_plan)
+
+    def cancel(self):
+        self._cancelled = True
+        for worker in self._workers:
+            if not self.pool.tryTake(worker):
+                worker.cancel()
+        self._workers.clear()
+        if self.plan is not None:
+            # Скопированное запоминаем в журнале: при продолжении эти файлы не читаются заново
+            done = {card["id"]: card for card in self._done}
+            self.plan["cards"] = [done.get(card["id"], card) for card in self.plan["cards"]]
+            save_journal(self.plan)
+
+    def running(self):
+        return bool(self._workers)
+
+    def _run(self, worker, on_result, on_error=None):
+        # Задачу держим сами: cancel() обращается к ней и после того, как она доработала
+        worker.setAutoDelete(False)
+        worker.signals.result.connect(on_result)
+        worker.signals.error.connect(on_error or self.error.emit)
+        worker.signals.finished.connect(lambda: self._forget(worker))
+        self._workers.append(worker)
+        self.pool.start(worker)
+
+    def _forget(self, worker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+
+    def _on_plan(self, plan):
+        if self._cancelled:
+            return
+        self.plan = plan
+        self._done, self._failed = [], []
+        self._pending = len(plan["cards"])
+        self.planned.emit(self._pending)
+        if not self._pending:
+            self._insert()
+            return
+        for card in plan["cards"]:
+            self._run(Worker(import_file, card), self._on_copied, lambda e, card=card: self._on_failed(card))
+
+    def _on_copied(self, card):
+        self._done.append(card)
+        self._step()
+
+    def _on_failed(self, card):
+        self._failed.append(card["source"])
+        self._step()
+
+    def _step(self):
+        if self._cancelled:
+            return
+        self._pending -= 1
+        self.progress.emit(len(self._done) + len(self._failed), len(self.plan["cards"]))
+        if not self._pending:
+            self._insert()
+
+    def _insert(self):
+        failed = self._failed
+
+        def on_inserted(rows):
+            remove_journal(self.plan)
+            # Карточкам без картинки рядом с видео превью делается из кадра;
+            # раскадровка и облегчённая копия для плеера строятся для всех
+            for row in rows:
+                if not row["preview_image_url"]:
+                    preview_jobs().submit(row["id"], row["video_url"])
+                scrub_jobs().submit(row["video_url"])
+                proxy_jobs().submit(row["video_url"])
+            self.finished.emit(len(rows), failed)
+
+        self._run(Worker(insert_import, self.plan, self._done), on_inserted)
@@ -1,109 +1,30 @@
-import sys
-
-from PySide6.QtWidgets import QApplication, QWidget, QHBoxLayout, \
-    QPushButton, QLabel, QGridLayout, QScrollArea, QMenu, \
-    QMenuBar, QTreeView
-from PySide6.QtGui import QPixmap, QIcon
-from PySide6.QtCore import Qt, QSize, QAbstractItemModel, QModelIndex
-
-from edit_cards import EditCardsWindow
-from edit_catalog import EditCatalogWindow
-from models import Category
-from player import Player
-from session import session
-from utils import request_cards, get_first_category_id
-from constants import PATH_PLAY_ICON, PATH_BLANK_IMG
-
-
-class CategoryTreeModel(QAbstractItemModel):
-    def __init__(self, root_categories=None, parent=None):
-        super().__init__(parent)
-        self.root_items = root_categories or []
-
-    def columnCount(self, parent=QModelIndex()):
-        return 1
-
-    def rowCount(self, parent=QModelIndex()):
-        if parent.isValid():
-            parent_item = parent.internalPointer()
-            return len(parent_item.children)
-        return len(self.root_items)
-
-    def data(self, index, role=Qt.DisplayRole):
-        if not index.isValid():
-            return None
-        if role == Qt.DisplayRole:
-            item = index.internalPointer()
-            return item.name
-        return None
-
-    def index(self, row, column, parent=QModelIndex()):
-        if not self.hasIndex(row, column, parent):
-            return QModelIndex()
-
-        if parent.isValid():
-            parent_item = parent.internalPointer()
-            child_item = parent_item.children[row]
-        else:
-            child_item = self.root_items[row]
-
-        return self.createIndex(row, column, child_item)
-
-    def parent(self, index):
-        if not index.isValid():
-            return QModelIndex()
-
-        item = index.internalPointer()
-        if item.parent is None:
-            return QModelIndex()
-
-        # Находим индекс родителя в его родительском списке
-        parent_item = item.parent
-        if parent_item.parent is None:
-            row = self.root_items.index(parent_item)
-        else:
-            row = parent_item.parent.children.index(parent_item)
-
-        return self.createIndex(row, 0, parent_item)
+import time
 
-    def flags(self, index):
-        if not index.isValid():
-            return Qt.NoItemFlags
-        return super().flags(index) & ~Qt.ItemFlag.ItemIsEditable
+# Отсчёт времени до первой отрисовки (метрика startup.first_paint) — до всех импортов,
+# чтобы в метрику входило и время загрузки модулей
+STARTED_AT = time.perf_counter()
 
-    def setData(self, index, value, role=Qt.EditRole):
-        if index.isValid() and role == Qt.EditRole:
-            item = index.internalPointer()
-            item.name = value
-            self.dataChanged.emit(index, index)
-            return True
-        return False
-
-    def addCategory(self, category, parent_index=QModelIndex()):
-        parent_item = parent_index.internalPointer() if parent_index.isValid() else None
-
-        if parent_item:
-            parent_item.children.append(category)
-        else:
-            self.root_items.append(category)
+import sys
 
-        self.layoutChanged.emit()
+from PySide6.QtWidgets import QApplication, QWidget, QHBoxLayout, \
+    QLabel, QStackedWidget, QMenu, QMenuBar, QTreeView
+from PySide6.QtCore import Qt, QDeadlineTimer, QTimer, QThreadPool
 
-    def removeCategory(self, index):
-        item = index.internalPointer()
-        parent = item.parent
+from card_grid import CardsModel, CardGridView, CARD_SIZE
+from category_tree import CategoryTreeModel, build_category_tree
+from constants import CARDS_PAGE_SIZE
+import metrics
+from metrics import record, timer
+from prefetch import Prefetcher
+from replica import replica
+from snapshot import load_snapshot, save_snapshot
+from utils import api_client
+from workers import CardsLoader, Worker, warm_up_database
 
-        if parent:
-            parent.children.remove(item)
-        else:
-            self.root_items.remove(item)
+# Окна редактирования и проигрыватель (QtMultimedia) импортируются при первом открытии.
 
-        self.layoutChanged.emit()
-
-    def getCategory(self, index):
-        if index.isValid():
-            return index.internalPointer()
-        return None
+# Сколько выход из приложения ждёт фоновые задачи — на все пулы вместе
+SHUTDOWN_TIMEOUT_MS = 5000
 
 
 class MainWindow(QWidget):
@@ -112,8 +33,11 @@ class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
         self.categories = {}
+        self.category_tree = None
         self.opened_windows = []
         self.current_category = None
+        self.painted = False
+        snapshot = load_snapshot()
 
         self.setWindowTitle("Планировщик тренировок")
         self.setGeometry(100, 100, 1400, 1000)
@@ -123,6 +47,18 @@ class MainWindow(QWidget):
         self.menuBar.addMenu(self.addCardMenu)
         self.addCardMenu.addAction("Карточки", self.edit_menu_cards)
         self.addCardMenu.addAction("Категории", self.edit_menu_categories)
+        self.viewMenu = QMenu("Вид")
+        self.menuBar.addMenu(self.viewMenu)
+        self.subtreeAction = self.viewMenu.addAction("Карточки подкатегорий")
+        self.subtreeAction.setCheckable(True)
+        self.subtreeAction.setChecked(snapshot is not None and snapshot.subtree)
+        self.subtreeAction.toggled.connect(self.load_cards)
+        # Панель замеров: только когда замеры включены (--metrics, --metrics-overlay)
+        self.metrics_overlay = None
+        if metrics.ENABLED:
+            self.metricsAction = self.viewMenu.addAction("Замеры")
+            self.metricsAction.setCheckable(True)
+            self.metricsAction.toggled.connect(self.show_metrics_overlay)
 
         self.layout = QHBoxLayout()
         # Список категорий
@@ -131,24 +67,65 @@ class MainWindow(QWidget):
         self.category.setSelectionMode(QTreeView.SingleSelection)
         self.category.setSelectionBehavior(QTreeView.SelectRows)
         self.category.setMaximumWidth(250)
-        self.category_model = CategoryTreeModel(self)
+        self.category_model = CategoryTreeModel(parent=self)
         self.category.setModel(self.category_model)
         self.layout.addWidget(self.category)
         self.category.clicked.connect(self.load_cards)
 
-        self.scroll_area = QScrollArea(self)
-        self.scroll_content = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_content)
-        self.scroll_area.setWidget(self.scroll_content)
-        self.scroll_area.setWidgetResizable(True)
-
-        self.layout.addWidget(self.scroll_area)
+        # Сетка карточек и заглушка на время загрузки
+        self.cards_model = CardsModel(self)
+        self.cards_view = CardGridView(self)
+        self.cards_view.setModel(self.cards_model)
+        # Следующая страница подгружается, когда до конца списка остаётся пара рядов
+        self.cards_view.verticalScrollBar().valueChanged.connect(self.load_more_cards)
+        self.cards_view.verticalScrollBar().rangeChanged.connect(self.load_more_cards)
+        self.cards_view.playClicked.connect(
+            lambda card: self.open_video(card["title"], card["video_url"]))
+        self.placeholder = QLabel()
+        self.placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.cards_stack = QStackedWidget(self)
+        self.cards_stack.addWidget(self.cards_view)
+        self.cards_stack.addWidget(self.placeholder)
+
+        self.layout.addWidget(self.cards_stack)
         self.layout.setMenuBar(self.menuBar)
         self.setLayout(self.layout)
 
-        self.play_icon = QIcon(PATH_PLAY_ICON)
-
-        self.load_categories()
+        self.cards_loader = CardsLoader(self)
+        self.cards_loader.loaded.connect(self.show_cards)
+        self.cards_loader.appended.connect(self.append_cards)
+        self.cards_loader.reloaded.connect(self.replace_cards)
+        self.cards_loader.failed.connect(self.show_cards_error)
+        self.cards_loader.done.connect(self.on_cards_loaded)
+        self.prefetcher = Prefetcher(self)
+        # Соседние категории ставятся в прогрев один раз на загрузку категории, а не на каждую страницу
+        self.prefetch_pending = False
+
+        # Снимок прошлого запуска рисуется сразу, данные загружаются после первой отрисовки
+        if snapshot is not None:
+            self.current_category = snapshot.category_id
+            self.apply_category_tree(build_category_tree(snapshot.categories))
+            self.show_cards(snapshot.category_id, snapshot.cards)
+
+        # Пока строится интерфейс, в фоне подключаемся к БД и синхронизируем каталог.
+        # Отдельный пул, чтобы эти задачи не занимали потоки, нужные запросам карточек
+        self.background_pool = QThreadPool(self)
+        self.background_pool.setMaxThreadCount(1)
+        self.warm_up_worker = Worker(warm_up_database)
+        self.background_pool.start(self.warm_up_worker)
+        self.sync_replica()
+        if metrics.OVERLAY:
+            self.metricsAction.setChecked(True)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            record("startup.first_paint", (time.perf_counter() - STARTED_AT) * 1000)
+            QTimer.singleShot(0, self.start_loading)
+
+    def start_loading(self):
+        self.apply_category_tree(build_category_tree(replica().categories()))
         self.load_cards()
 
     def load_cards(self):
@@ -156,61 +133,129 @@ class MainWindow(QWidget):
         if current_index.isValid():
             category_id = current_index.internalPointer().id
         else:
-            category_id = get_first_category_id()
-        self.clear_layout(self.grid_layout)
-        self.current_category = category_id
-        cards = request_cards(category_id)
-        row = 0
-        col = 0
-        for card in cards:
-            title = QLabel(card["title"])
-            title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            preview = QLabel()
-            pixmap = QPixmap(card["preview_image_url"] or PATH_BLANK_IMG)
-            preview.setPixmap(
-                pixmap.scaled(150, 150, Qt.AspectRatioMode.IgnoreAspectRatio))
-            preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            preview.setToolTip(card["description"])
-
-            button = QPushButton()
-            button.setIcon(self.play_icon)
-            button.clicked.connect(lambda checked, title=card["title"],
-                                          video_url=card["video_url"]: self.open_video(title, video_url))
-            button.setMaximumWidth(50)
-            button.setIconSize(QSize(40, 20))
-            button.setFlat(True)
-            self.grid_layout.addWidget(title, row, col)
-            self.grid_layout.addWidget(preview, row + 1, col)
-            self.grid_layout.addWidget(button, row + 2, col)
-
-            col += 1
-            if col == 3:
-                col = 0
-                row += 3
+            category_id = None
+        subtree = self.subtreeAction.isChecked()
+        self.prefetcher.pause()
+        self.prefetch_pending = True
+        self.cards_loader.load(category_id, subtree)
+        # Карточки из кэша или локальной копии показываем сразу, свежий ответ придёт следом
+        cached = None
+        with timer("main.cached_cards"):
+            if category_id is not None and not subtree:
+                cached = api_client().cached_cards(category_id, limit=CARDS_PAGE_SIZE)
+            if cached is None and category_id is not None:
+                cached, _ = replica().cards_page(category_id, subtree=subtree)
+        if cached:
+            self.show_cards(category_id, cached)
+        else:
+            self.show_placeholder("Загрузка...")
+
+    def show_placeholder(self, text):
+        """Заглушка вместо сетки карточек на время загрузки или при ошибке"""
+        self.placeholder.setText(text)
+        self.cards_stack.setCurrentWidget(self.placeholder)
+
+    def show_cards_error(self, category_id, error):
+        self.show_placeholder("Не удалось загрузить карточки")
+
+    def show_cards(self, category_id, cards):
+        if category_id != self.current_category or cards != self.cards_model.items:
+            self.current_category = category_id
+            with timer("main.show_cards"):
+                self.cards_model.setCards(cards)
+                self.cards_view.scrollToTop()
+        self.cards_stack.setCurrentWidget(self.cards_view)
+
+    def append_cards(self, category_id, cards):
+        if category_id == self.current_category:
+            self.cards_model.appendCards(cards)
+
+    def replace_cards(self, category_id, cards):
+        """Сменился источник карточек: те же строки перечитаны целиком, прокрутка остаётся на месте"""
+        if category_id == self.current_category:
+            bar = self.cards_view.verticalScrollBar()
+            value = bar.value()
+            self.cards_model.setCards(cards)
+            bar.setValue(value)
+
+    def load_more_cards(self) -> bool:
+        bar = self.cards_view.verticalScrollBar()
+        if bar.maximum() - bar.value() < 2 * CARD_SIZE.height() and self.cards_loader.load_more():
+            # Пока листают, прогрев соседних категорий не отнимает у страниц потоки и сеть
+            self.prefetcher.pause()
+            return True
+        return False
+
+    def on_cards_loaded(self):
+        """Страница пришла. Соседние категории ставятся в прогрев после первой страницы"""
+        if self.prefetch_pending:
+            self.prefetch_pending = False
+            node = self.category_tree.by_id.get(self.current_category) if self.category_tree else None
+            if node is not None:
+                self.prefetcher.prefetch_around(node, self.category_tree.roots)
+        # Первая страница могла не заполнить окно — тогда полосы прокрутки нет
+        QTimer.singleShot(0, self.continue_paging)
+
+    def continue_paging(self):
+        """Дозагружаем страницы, пока окно не заполнено; прогрев продолжается, когда страниц не ждём"""
+        if not self.load_more_cards() and not self.cards_loader.loading():
+            self.prefetcher.resume()
 
     def load_categories(self):
-        self.categories = {}
-        categories = session.query(Category).all()
-        root_categories = [cat for cat in categories if cat.parent_id is None]
-        for category in categories:
-            self.categories[category.id] = category.name
-            self._build_children(category, categories)
-        # Обновляем модель
-        self.category_model = CategoryTreeModel(root_categories)
-        self.category.setModel(self.category_model)
-        self.category.expandAll()
+        """Дерево категорий из локальной копии, затем синхронизация с сервером"""
+        self.apply_category_tree(build_category_tree(replica().categories()))
+        self.sync_replica()
 
-    def _build_children(self, parent, categories):
-        """Рекурсивно собираем все категории"""
-        children = [cat for cat in categories if cat.parent_id == parent.id]
-        parent.children = children
-        for child in children:
-            self._build_children(child, categories)
+    def apply_category_tree(self, tree):
+        self.category_tree = tree
+        self.categories = {node.id: node.name for node in tree}
+        # Обновляем модель
+        with timer("main.apply_category_tree"):
+            self.category_model = CategoryTreeModel(tree.roots)
+            self.category.setModel(self.category_model)
+            self.category.expandAll()
+        node = tree.by_id.get(self.current_category)
+        if node is not None:
+            self.category.setCurrentIndex(self.category_model.nodeIndex(node))
+        self.prefetcher.set_categories(node.id for node in tree)
+
+    def sync_replica(self):
+        self.sync_worker = Worker(replica().sync)
+        self.sync_worker.signals.result.connect(self.on_replica_synced)
+        self.sync_worker.signals.error.connect(lambda error: self.set_offline(True))
+        self.background_pool.start(self.sync_worker)
+
+    def on_replica_synced(self, changed):
+        self.set_offline(False)
+        if changed:
+            self.apply_category_tree(build_category_tree(replica().categories()))
+            if self.cards_stack.currentWidget() is self.placeholder:
+                self.load_cards()
+
+    def set_offline(self, offline):
+        """Без связи с сервером каталог доступен только для просмотра"""
+        self.addCardMenu.setEnabled(not offline)
+        title = "Планировщик тренировок"
+        self.setWindowTitle(f"{title} (нет связи с сервером)" if offline else title)
+
+    def show_metrics_overlay(self, visible):
+        if self.metrics_overlay is None:
+            from metrics_overlay import MetricsOverlay
+
+            self.metrics_overlay = MetricsOverlay(self)
+        self.metrics_overlay.setVisible(visible)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.metrics_overlay is not None:
+            self.metrics_overlay.place()
 
     def open_video(self, title, video_url):
+        from player import Player
+
         self.player = Player()
         self.player.setWindowTitle(title)
-        self.player.player.setSource(video_url)
+        self.player.open_video(video_url)
         self.player.show()
         self.player.player.play()
         self.opened_windows.append(self.player)
@@ -218,34 +263,35 @@ class MainWindow(QWidget):
     def closeEvent(self, event):
         for window in self.opened_windows:
             window.close()
+        if self.category_tree is not None:
+            try:
+                save_snapshot(self.category_tree, self.current_category, self.subtreeAction.isChecked(),
+                              self.cards_model.items[:CARDS_PAGE_SIZE])
+            except OSError:
+                pass
         event.accept()
 
     def edit_menu_cards(self):
+        from edit_cards import EditCardsWindow
+
         self.edit_card = EditCardsWindow(self.current_category)
         self.edit_card.exitButtonClicked.connect(self.on_exitButton_click)
         self.edit_card.show()
         self.opened_windows.append(self.edit_card)
 
     def edit_menu_categories(self):
+        from edit_catalog import EditCatalogWindow
+
         self.edit_categories = EditCatalogWindow()
         self.edit_categories.exitButtonClicked.connect(self.on_exitButton_click)
         self.edit_categories.show()
         self.opened_windows.append(self.edit_categories)
 
     def on_exitButton_click(self):
+        api_client().invalidate()
         self.load_categories()
         self.load_cards()
 
-    def clear_layout(self, layout):
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-            else:
-                self.clear_layout(item.layout())
-            layout.removeItem(item)
-
     def center_window(self):
         screen = QApplication.primaryScreen()
         if screen:
@@ -257,9 +303,43 @@ class MainWindow(QWidget):
             print("No screen found!")
 
 
+def resume_proxy_jobs():
+    """Облегчённые копии, не доделанные в прошлый раз, продолжают кодироваться"""
+    from proxies import proxy_jobs
+
+    proxy_jobs().resume()
+
+
+def shutdown(window):
+    """Выход из приложения. Сначала снимаем все очереди сразу: копии видео
+    убирают за собой недокопированные файлы, ffmpeg останавливается, а очередь
+    облегчённых копий остаётся до следующего запуска. Потом ждём все пулы
+    с одним общим сроком SHUTDOWN_TIMEOUT_MS"""
+    from media_store import media_jobs
+    from previews import preview_jobs
+    from proxies import proxy_jobs
+    from scrub import scrub_jobs
+
+    window.cards_loader.cancel()
+    window.prefetcher.stop()
+    media_jobs().stop()
+    proxy_jobs().stop()
+    preview_jobs().cancel()
+    scrub_jobs().cancel()
+    deadline = QDeadlineTimer(SHUTDOWN_TIMEOUT_MS)
+    # Фоновые задачи (подключение к БД, синхронизация) дорабатывают до выхода из интерпретатора
+    for pool in (QThreadPool.globalInstance(), window.background_pool, window.prefetcher.pool, media_jobs().pool,
+                 proxy_jobs().pool, preview_jobs().pool, scrub_jobs().pool):
+        pool.waitForDone(deadline)
+
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
+    app.aboutToQuit.connect(lambda: shutdown(window))
+    # Соединения закрываются, когда запросы в пулах уже доработали
+    app.aboutToQuit.connect(lambda: api_client().close())
     window.show()
     window.center_window()
+    QTimer.singleShot(0, resume_proxy_jobs)
     sys.exit(app.exec())
@@ -0,0 +1,351 @@
+"""Хранилище медиа с адресацией по содержимому.
+
+Файл лежит под именем своего SHA-256: video/store/ab/abcdef….mp4, поэтому
+одинаковые видео и картинки хранятся один раз, сколько бы карточек на них
+ни ссылалось. Сколько карточек ссылается на файл, хранит таблица
+media_files; файл удаляется, когда ссылок не остаётся. Строка появляется
+сразу, как файл лёг в хранилище, со счётчиком 0: файл, на который так и не
+сослалась ни одна карточка (диалог закрыли, импорт пропустил дубль), удаляет
+sweep_unclaimed() через UNCLAIMED_TTL.
+
+Копирование идёт без чтения в Python, где это умеет ОС: reflink (FICLONE),
+os.copy_file_range, os.sendfile, и только потом обычное чтение кусками.
+Большие файлы кладутся в хранилище через очередь media_jobs() в фоне.
+"""
+import errno
+import hashlib
+import itertools
+import os
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
+
+from constants import (PATH_VIDEO, PATH_IMAGES, MEDIA_COPY_THREADS, PROXY_SUFFIX, SCRUB_INDEX_SUFFIX,
+                       SCRUB_SPRITES_SUFFIX)
+from utils import singleton
+from workers import Worker
+
+PATH_VIDEO_STORE = PATH_VIDEO + "store/"
+PATH_IMAGES_STORE = PATH_IMAGES + "store/"
+# Кусок чтения при хэшировании и копировании; после каждого — отчёт о прогрессе
+CHUNK_SIZE = 8 * 1024 * 1024
+# ioctl клонирования файла на Btrfs/XFS: копия без копирования данных
+FICLONE = 0x40049409
+# Ошибки, после которых пробуем следующий способ копирования
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM}
+# Сколько файл без ссылок живёт в хранилище: за это время диалог или импорт успевают записать карточку
+UNCLAIMED_TTL = timedelta(days=1)
+# Сколько раз register повторяет вставку, если ту же строку одновременно вставил другой поток
+REGISTER_ATTEMPTS = 3
+
+
+def store_path(digest, extension, root=PATH_VIDEO_STORE) -> str:
+    return f"{root}{digest[:2]}/{digest}{extension.lower()}"
+
+
+def temp_path(path, suffix=".part") -> str:
+    """Свой временный файл рядом с path на каждый вызов: один и тот же файл
+    (одинаковое содержимое, общая заглушка) могут писать несколько потоков сразу.
+    suffix — если программе, которая пишет файл, формат нужен по расширению"""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=suffix,
+                                    dir=os.path.dirname(path) or os.curdir)
+    os.close(fd)
+    return tmp_path
+
+
+def _is_stored(path, size) -> bool:
+    try:
+        return os.path.getsize(path) == size
+    except OSError:
+        return False
+
+
+def derived_paths(path) -> list[str]:
+    """Файл медиа и всё, что строится из него рядом: раскадровка и облегчённая копия"""
+    return [path, path + SCRUB_INDEX_SUFFIX, path + SCRUB_SPRITES_SUFFIX, path + PROXY_SUFFIX]
+
+
+def remove_files(paths):
+    """Удаляем файлы медиа вместе с производными; уже отсутствующие пропускаем"""
+    for path in paths:
+        for file_path in derived_paths(path):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+
+def hash_file(path):
+    """SHA-256 файла потоково; генератор отдаёт прочитанные байты, результат — через return"""
+    digest = hashlib.sha256()
+    done = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+            done += len(chunk)
+            yield done
+    return digest.hexdigest()
+
+
+def _reflink(source, destination) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def copy_file(source_path, destination_path):
+    """Копируем файл самым дешёвым доступным способом; генератор отдаёт скопированные байты"""
+    size = os.path.getsize(source_path)
+    with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+        if size and _reflink(source, destination):
+            yield size
+            return
+        copied = 0
+        for method in ("copy_file_range", "sendfile"):
+            if not hasattr(os, method):
+                continue
+            try:
+                while copied < size:
+                    if method == "copy_file_range":
+                        n = os.copy_file_range(source.fileno(), destination.fileno(), CHUNK_SIZE,
+                                               copied, copied)
+                    else:
+                        os.lseek(destination.fileno(), copied, os.SEEK_SET)
+                        n = os.sendfile(destination.fileno(), source.fileno(), copied, CHUNK_SIZE)
+                    if not n:
+                        break
+                    copied += n
+                    yield copied
+                return
+            except OSError as e:
+                # Уже начатую копию не перезапускаем: ошибка настоящая
+                if copied or e.errno not in UNSUPPORTED:
+                    raise
+        while chunk := source.read(CHUNK_SIZE):
+            destination.write(chunk)
+            copied += len(chunk)
+            yield copied
+
+
+def put_file(source, root=PATH_VIDEO_STORE):
+    """Кладём файл в хранилище. Генератор отдаёт (готово, всего) в байтах:
+    сначала хэширование, потом копирование; результат — путь в хранилище.
+    Если такой файл уже есть, копирования нет. Недокопированный файл при
+    ошибке или отмене удаляется"""
+    size = os.path.getsize(source)
+    total = 2 * size
+    digest = yield from _report(hash_file(source), 0, total)
+    path = store_path(digest, os.path.splitext(source)[1], root)
+    if _is_stored(path, size):
+        register([path])
+        yield total, total
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path(path)
+    try:
+        yield from _report(copy_file(source, tmp_path), size, total)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if not _is_stored(path, size):
+        raise OSError(f"Файл в хранилище не совпадает с исходным: {path}")
+    register([path])
+    return path
+
+
+def put_bytes(data: bytes, extension, root=PATH_IMAGES_STORE) -> str:
+    """Небольшой файл из памяти (уменьшенное превью) — сразу, без фоновой задачи"""
+    path = store_path(hashlib.sha256(data).hexdigest(), extension, root)
+    if not _is_stored(path, len(data)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if not _is_stored(path, len(data)):
+            raise OSError(f"Файл в хранилище не совпадает с исходным: {path}")
+    register([path])
+    return path
+
+
+def register(paths):
+    """Файлы легли в хранилище: строка со счётчиком 0, пока на них не сослалась карточка.
+    У уже известных файлов только обновляется время, чтобы sweep_unclaimed их не тронул"""
+    from sqlalchemy import insert, select, update
+    from sqlalchemy.exc import IntegrityError
+
+    from models import MediaFile
+    from session import Session
+
+    with Session() as s:
+        for attempt in range(REGISTER_ATTEMPTS):
+            known = set(s.execute(select(MediaFile.path).where(MediaFile.path.in_(paths))).scalars())
+            if known:
+                s.execute(update(MediaFile).where(MediaFile.path.in_(known))
+                          .values(updated_at=datetime.now(timezone.utc)))
+            new = [{"path": path, "refcount": 0} for path in paths if path not in known]
+            try:
+                if new:
+                    s.execute(insert(MediaFile), new)
+                s.commit()
+                return
+            except IntegrityError:
+                # Тот же файл одновременно зарегистрировал другой поток: строка уже есть,
+                # при повторе она попадёт в known
+                s.rollback()
+                if attempt == REGISTER_ATTEMPTS - 1:
+                    raise
+
+
+def sweep_unclaimed(ttl=UNCLAIMED_TTL) -> list[str]:
+    """Удаляем файлы, на которые за ttl так и не сослалась ни одна карточка"""
+    from sqlalchemy import delete
+
+    from models import MediaFile
+    from session import Session
+
+    with Session() as s:
+        orphaned = sorted(s.execute(delete(MediaFile).where(
+            MediaFile.refcount <= 0, MediaFile.updated_at < datetime.now(timezone.utc) - ttl)
+                                    .returning(MediaFile.path)).scalars())
+        s.commit()
+    remove_files(orphaned)
+    return orphaned
+
+
+def acquire(s, paths):
+    """Карточки стали ссылаться на файлы: увеличиваем счётчики в той же транзакции"""
+    from sqlalchemy import insert, select, update
+
+    from models import MediaFile
+
+    counts = Counter(path for path in paths if path)
+    if not counts:
+        return
+    known = set(s.execute(select(MediaFile.path).where(MediaFile.path.in_(counts))).scalars())
+    new = [{"path": path, "refcount": n} for path, n in counts.items() if path not in known]
+    if new:
+        s.execute(insert(MediaFile), new)
+    for n, group in _group_by_count(counts, known).items():
+        s.execute(update(MediaFile).where(MediaFile.path.in_(group)).values(refcount=MediaFile.refcount + n))
+
+
+def release(s, paths) -> list[str]:
+    """Карточки перестали ссылаться на файлы. Возвращаем файлы, на которые
+    ссылок больше нет: их строки уже удалены, сами файлы удаляет вызывающий
+    после commit"""
+    from sqlalchemy import delete, update
+
+    from models import MediaFile
+
+    counts = Counter(path for path in paths if path)
+    if not counts:
+        return []
+    for n, group in _group_by_count(counts, counts).items():
+        s.execute(update(MediaFile).where(MediaFile.path.in_(group)).values(refcount=MediaFile.refcount - n))
+    return sorted(s.execute(delete(MediaFile).where(MediaFile.path.in_(counts), MediaFile.refcount <= 0)
+                            .returning(MediaFile.path)).scalars())
+
+
+def _group_by_count(counts, paths) -> dict[int, list[str]]:
+    """Пути с одинаковым приращением — одним UPDATE ... WHERE path IN (...)"""
+    groups = {}
+    for path, n in counts.items():
+        if path in paths:
+            groups.setdefault(n, []).append(path)
+    return groups
+
+
+def _report(generator, offset, total):
+    """Прогресс вложенного шага как (готово, всего) по всей операции; его результат — наш"""
+    try:
+        while True:
+            try:
+                done = next(generator)
+            except StopIteration as stop:
+                return stop.value
+            yield offset + done, total
+    finally:
+        # При отмене закрываем и вложенный шаг, чтобы он отпустил файлы
+        generator.close()
+
+
+class MediaJobs(QObject):
+    """Очередь копирования файлов в хранилище.
+
+    Очередь одна на приложение: задача доделывается, даже если окно, которое
+    её поставило, закрыто, а тот же файл, поставленный повторно, не копируется
+    второй раз — возвращается уже идущая задача. Сигналы несут номер задачи.
+    """
+    progress = Signal(int, object)
+    finished = Signal(int, str)
+    failed = Signal(int, object)
+    cancelled = Signal(int)
+
+    def __init__(self, max_threads=MEDIA_COPY_THREADS):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._ids = itertools.count(1)
+        self._workers = {}
+        self._keys = {}
+
+    def submit(self, source, root=PATH_VIDEO_STORE) -> int:
+        """Ставим файл в очередь; прогресс приходит как (готово, всего) в байтах"""
+        key = (os.path.abspath(source), root)
+        if key in self._keys:
+            return self._keys[key]
+        job_id = next(self._ids)
+        worker = Worker(put_file, source, root)
+        # Задачу держим сами до сигнала finished: отмена может прийти, когда она уже доработала
+        worker.setAutoDelete(False)
+        worker.signals.progress.connect(lambda progress: self.progress.emit(job_id, progress))
+        worker.signals.result.connect(lambda path: self.finished.emit(job_id, path))
+        worker.signals.error.connect(lambda error: self.failed.emit(job_id, error))
+        worker.signals.finished.connect(lambda: self._forget(job_id))
+        self._workers[job_id] = worker
+        self._keys[key] = job_id
+        self.pool.start(worker)
+        return job_id
+
+    def cancel(self, job_id):
+        """Снимаем задачу; недокопированный файл удаляет put_file"""
+        worker = self._workers.get(job_id)
+        if worker is None:
+            return
+        self._keys = {key: id_ for key, id_ in self._keys.items() if id_ != job_id}
+        if self.pool.tryTake(worker):
+            # Задача не начиналась, и finished от неё не придёт
+            self._forget(job_id)
+        else:
+            worker.cancel()
+        self.cancelled.emit(job_id)
+
+    def active(self) -> int:
+        return len(self._keys)
+
+    def stop(self):
+        """Выход из приложения: отменяем всё; недокопированные файлы копии убирают за собой,
+        дождаться их — дело вызывающего (pool.waitForDone)"""
+        for job_id in list(self._workers):
+            self.cancel(job_id)
+
+    def _forget(self, job_id):
+        self._workers.pop(job_id, None)
+        self._keys = {key: id_ for key, id_ in self._keys.items() if id_ != job_id}
+
+
+media_jobs = singleton(MediaJobs)
@@ -0,0 +1,181 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+from constants import PATH_METRICS, METRICS_SAMPLES
+
+
+def _option(flag, env):
+    """Опция включается флагом командной строки или переменной окружения"""
+    return flag in sys.argv or os.getenv(env, "0") not in ("", "0")
+
+
+# Замеры выключены по умолчанию: timed() тогда возвращает функцию как есть,
+# а timer() — пустой контекст, так что в обычном режиме накладных расходов нет
+OVERLAY = _option("--metrics-overlay", "TP_METRICS_OVERLAY")
+ENABLED = OVERLAY or _option("--metrics", "TP_METRICS")
+REPORT_PATH = os.getenv("TP_METRICS_REPORT", PATH_METRICS)
+
+
+def percentile(samples, p):
+    """Перцентиль по ближайшему рангу; samples отсортированы"""
+    if not samples:
+        return None
+    rank = max(0, min(len(samples) - 1, round(p / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+class Timing:
+    """Замеры одной операции: счётчики и последние METRICS_SAMPLES значений для перцентилей"""
+    __slots__ = ("count", "total", "min", "max", "last", "updated", "samples")
+
+    def __init__(self, max_samples):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.updated = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        self.last = ms
+        self.updated = time.monotonic()
+        self.samples.append(ms)
+
+    def summary(self) -> dict:
+        samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3),
+            "min_ms": round(self.min, 3),
+            "max_ms": round(self.max, 3),
+            "last_ms": round(self.last, 3),
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+        }
+
+
+class Metrics:
+    """Именованные таймеры и счётчики. Можно писать из любых потоков"""
+
+    def __init__(self, max_samples=METRICS_SAMPLES):
+        self.max_samples = max_samples
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = {}
+
+    def record(self, name, ms):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = Timing(self.max_samples)
+            timing.add(ms)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def latest(self, limit=None) -> list[tuple[str, dict]]:
+        """Сводки операций, начиная с последней обновлённой (для оверлея)"""
+        with self._lock:
+            timings = sorted(self._timings.items(), key=lambda item: item[1].updated, reverse=True)
+            return [(name, timing.summary()) for name, timing in timings[:limit]]
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "duration_sec": round(time.time() - self.started_at, 3),
+                "timings": {name: timing.summary() for name, timing in sorted(self._timings.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def dump(self, path=REPORT_PATH):
+        """Отчёт в JSON; пишется атомарно, как и остальные файлы кэша"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+_NULL_TIMER = nullcontext()
+
+
+def timer(name):
+    """with timer("api.request"): ... — замер блока кода"""
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name):
+    """Декоратор: замер каждого вызова функции"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    if ENABLED:
+        metrics.count(name, n)
+
+
+def record(name, ms):
+    """Значение, измеренное снаружи (например, задержка между сигналами)"""
+    if ENABLED:
+        metrics.record(name, ms)
+
+
+def _dump_on_exit():
+    try:
+        metrics.dump()
+    except OSError as e:
+        print(f"Не удалось сохранить отчёт замеров: {e}", file=sys.stderr)
+
+
+if ENABLED:
+    atexit.register(_dump_on_exit)
@@ -0,0 +1,45 @@
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFontDatabase
+from PySide6.QtWidgets import QLabel
+
+from metrics import metrics
+
+OVERLAY_ROWS = 12
+OVERLAY_REFRESH_MS = 1000
+
+
+class MetricsOverlay(QLabel):
+    """Полупрозрачная панель поверх окна с последними замерами.
+    Клики проходят сквозь неё к виджетам под ней"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; padding: 6px;")
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(OVERLAY_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    def refresh(self):
+        lines = [f"{'операция':<28}{'посл.':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'n':>7}"]
+        for name, summary in metrics.latest(OVERLAY_ROWS):
+            lines.append(f"{name[:27]:<28}{summary['last_ms']:>8.1f}{summary['p50_ms']:>8.1f}"
+                         f"{summary['p95_ms']:>8.1f}{summary['p99_ms']:>8.1f}{summary['count']:>7}")
+        counters = metrics.counters()
+        if counters:
+            lines.append("")
+            lines.extend(f"{name[:27]:<28}{value:>8}" for name, value in sorted(counters.items()))
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.place()
+
+    def place(self):
+        """Правый нижний угол родителя"""
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 10, parent.height() - self.height() - 10)
+        self.raise_()
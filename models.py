@@ -1,6 +1,7 @@
 import uuid
+from datetime import datetime
 
-from sqlalchemy import String, ForeignKey, Text, Boolean
+from sqlalchemy import String, ForeignKey, Text, Boolean, DateTime, Integer, func
 from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 
@@ -32,6 +33,8 @@ class Category(Base):
     id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     parent_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("categories.id"), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True,
+                                                 server_default=func.now(), onupdate=func.now())
     parent = relationship('Category', remote_side=[id], backref='children')
 
     def __repr__(self):
@@ -47,6 +50,8 @@ class Card(Base):
     category_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("categories.id"))
     invisible: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     description: Mapped[str] = mapped_column(String(512), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True,
+                                                 server_default=func.now(), onupdate=func.now())
     category = relationship("Category", backref="cards")
 
     def __repr__(self):
@@ -60,5 +65,20 @@ class Comment(Base):
     user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.id"))
     card_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("cards.id"))
     comment: Mapped[str] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True,
+                                                 server_default=func.now(), onupdate=func.now())
     user = relationship("User")
     card = relationship("Card")
+
+
+class MediaFile(Base):
+    """Файл медиа и число карточек, которые на него ссылаются"""
+    __tablename__ = "media_files"
+    path: Mapped[str] = mapped_column(String(255), primary_key=True)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Когда файл положили в хранилище или сослались на него; по нему удаляются файлы без ссылок
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True,
+                                                 server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<MediaFile(path={self.path}, refcount={self.refcount})>"
@@ -3,16 +3,19 @@ main_window.py
 Contains MainWindow class
 """
 
+import os
 from functools import partial
 
-from PySide6.QtCore import Qt, QEvent, QUrl
+from PySide6.QtCore import Qt, QEvent, QUrl, QPoint, Signal
 from PySide6.QtGui import QShortcut, QKeySequence
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtWidgets import QMainWindow, QToolBar, QStyle, QSlider, QWidget, \
     QVBoxLayout, \
-    QLabel, QHBoxLayout, QDialog
+    QLabel, QHBoxLayout, QDialog, QStyleOptionSlider
 
 from custom_video_widget import CustomVideoWidget
+from proxies import has_proxy, proxy_path, proxy_jobs
+from scrub import load_scrub, scrub_jobs
 from utils import singleton
 
 
@@ -23,6 +26,13 @@ class Player(QMainWindow):
         super().__init__(parent)
         self.setGeometry(400, 150, 800, 600)
         self.current_movie_duration = 0
+        # Раскадровка текущего видео: кадры для перемотки и ключевые кадры
+        self.scrub = None
+        # Путь к оригиналу; играть может его облегчённая копия
+        self.video_path = None
+        self.playing_proxy = False
+        # Позиция, на которую встать после смены источника (копия ↔ оригинал)
+        self.pending_position = None
         self.setup_ui()
 
     def setup_ui(self) -> None:
@@ -61,7 +71,10 @@ class Player(QMainWindow):
         self.player.setAudioOutput(self.audio_widget)
 
         # slider
-        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider = ScrubSlider(Qt.Orientation.Horizontal)
+        # Кадр из раскадровки над ползунком
+        self.scrub_preview = QLabel(self, Qt.WindowType.ToolTip)
+        self.scrub_preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.lab_elapsed_time = QLabel("00:00")
         self.lab_remaining_time = QLabel("00:00")
 
@@ -76,6 +89,11 @@ class Player(QMainWindow):
         self.act_back_tb = self.toolbar.addAction(self.back_icon, "-5 sec")
         self.act_forward_tb = self.toolbar.addAction(self.forward_icon, "+5 sec")
         self.act_stop_tb = self.toolbar.addAction(self.stop_icon, "Stop")
+        self.toolbar.addSeparator()
+        self.act_original_tb = self.toolbar.addAction("Оригинал")
+        self.act_original_tb.setCheckable(True)
+        self.act_original_tb.setToolTip("Смотреть исходное видео вместо облегчённой копии")
+        self.act_original_tb.setEnabled(False)
 
     def create_layouts(self) -> None:
         """Creates UI layouts"""
@@ -114,7 +132,20 @@ class Player(QMainWindow):
         # Slider necessary connections
         self.player.positionChanged.connect(self.update_slider)
         self.player.durationChanged.connect(self.update_slider_range)
-        self.slider.sliderMoved.connect(self.set_video_position)
+        self.slider.sliderMoved.connect(self.scrub_to)
+        self.slider.sliderReleased.connect(self.seek_to_slider)
+        self.slider.hovered.connect(self.show_scrub_preview)
+        self.slider.left.connect(self.scrub_preview.hide)
+        # Очереди общие на приложение и переживают окно: в closeEvent от них отключаемся
+        self.job_connections = [
+            (scrub_jobs().ready, self.on_scrub_ready),
+            (proxy_jobs().ready, self.on_proxy_ready),
+        ]
+        for signal, slot in self.job_connections:
+            signal.connect(slot)
+
+        # Proxy
+        self.act_original_tb.toggled.connect(self.switch_source)
 
         # Back_5_sec button necessary connection
         self.player.positionChanged.connect(self.update_buttons)
@@ -147,6 +178,91 @@ class Player(QMainWindow):
         """Handles media status changes to reload video when reaching the end"""
         if status == QMediaPlayer.MediaStatus.EndOfMedia:
             self.player.pause()
+        elif status == QMediaPlayer.MediaStatus.LoadedMedia and self.pending_position is not None:
+            self.player.setPosition(self.pending_position)
+            self.pending_position = None
+
+    def open_video(self, video_path):
+        """Открываем видео: облегчённую копию, если она готова и не выбран оригинал.
+        Копии и раскадровки ещё нет — они строятся в фоне, а пока играет оригинал"""
+        self.video_path = video_path or None
+        self.pending_position = None
+        self.load_scrub()
+        proxy_ready = bool(self.video_path) and has_proxy(self.video_path)
+        if self.video_path and not proxy_ready:
+            proxy_jobs().submit(self.video_path, urgent=True)
+        # Кнопка показывает, что играет сейчас; переключение здесь не нужно
+        self.act_original_tb.blockSignals(True)
+        self.act_original_tb.setChecked(not proxy_ready)
+        self.act_original_tb.blockSignals(False)
+        self.act_original_tb.setEnabled(proxy_ready)
+        self.set_source(proxy_ready)
+
+    def set_source(self, proxy):
+        self.playing_proxy = proxy
+        if not self.video_path:
+            self.player.setSource(QUrl())
+            return
+        path = proxy_path(self.video_path) if proxy else self.video_path
+        self.player.setSource(QUrl.fromLocalFile(os.path.abspath(path)) if os.path.exists(path) else QUrl(path))
+
+    def switch_source(self, original):
+        """Переключаемся между копией и оригиналом с той же позиции"""
+        if not self.video_path or self.playing_proxy != original:
+            return
+        position = self.player.position()
+        playing = self.player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+        self.set_source(not original)
+        self.pending_position = position
+        if playing:
+            self.player.play()
+
+    def on_proxy_ready(self, video_path, proxy):
+        """Копия доделана, пока смотрели оригинал: источник не меняем, только даём выбрать"""
+        if video_path == self.video_path:
+            self.act_original_tb.setEnabled(True)
+
+    def load_scrub(self):
+        """Раскадровка текущего видео; если её ещё нет, строится в фоне"""
+        self.scrub = load_scrub(self.video_path)
+        self.scrub_preview.hide()
+        if self.scrub is None and self.video_path:
+            scrub_jobs().submit(self.video_path)
+
+    def on_scrub_ready(self, video_path):
+        if video_path == self.video_path and self.scrub is None:
+            self.scrub = load_scrub(video_path)
+
+    def scrub_to(self, position):
+        """Ползунок тянут: с раскадровкой показываем кадр из неё, перемотка — после отпускания"""
+        if self.scrub is None:
+            self.set_video_position(position)
+            return
+        self.lab_elapsed_time.setText(format_time(position))
+        self.lab_remaining_time.setText(format_time(self.current_movie_duration - position))
+        self.show_scrub_preview(position)
+
+    def seek_to_slider(self):
+        """Ползунок отпустили: перематываем на ближайший ключевой кадр.
+        Без раскадровки видео уже перематывалось, пока ползунок тянули"""
+        self.scrub_preview.hide()
+        if self.scrub is None:
+            return
+        position = self.slider.value()
+        # У копии ключевые кадры частые, по ней перематываем точно
+        if not self.playing_proxy:
+            position = self.scrub.nearest_keyframe(position)
+        self.set_video_position(position)
+
+    def show_scrub_preview(self, position):
+        """Кадр из раскадровки над точкой ползунка"""
+        if self.scrub is None:
+            return
+        self.scrub_preview.setPixmap(self.scrub.frame(position))
+        self.scrub_preview.adjustSize()
+        x = self.slider.position_to_x(position) - self.scrub_preview.width() // 2
+        self.scrub_preview.move(self.slider.mapToGlobal(QPoint(x, -self.scrub_preview.height() - 4)))
+        self.scrub_preview.show()
 
     def set_video_position(self, position):
         """Sets the video position based on the slider"""
@@ -174,6 +290,9 @@ class Player(QMainWindow):
 
     def update_slider(self, position):
         """Updates the slider position"""
+        if self.slider.isSliderDown():
+            # Пока ползунок тянут, он показывает, куда перемотать, а не где видео
+            return
         self.slider.setValue(position)
         self.lab_elapsed_time.setText(format_time(position))
         self.lab_remaining_time.setText(
@@ -187,6 +306,10 @@ class Player(QMainWindow):
 
     def closeEvent(self, event: QEvent):
         """Обрабатываем закрытие окна плеера по крестику"""
+        self.scrub_preview.hide()
+        for signal, slot in self.job_connections:
+            signal.disconnect(slot)
+        self.job_connections = []
         # 1. Останавливаем воспроизведение (если есть медиаплеер)
         if hasattr(self, 'player') and self.player.mediaStatus() != QMediaPlayer.NoMedia:
             self.player.stop()
@@ -196,6 +319,43 @@ class Player(QMainWindow):
         event.accept()
 
 
+class ScrubSlider(QSlider):
+    """Ползунок, который сообщает позицию под мышью: hovered(позиция), left() — мышь ушла"""
+    hovered = Signal(int)
+    left = Signal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setMouseTracking(True)
+
+    def _geometry(self):
+        option = QStyleOptionSlider()
+        self.initStyleOption(option)
+        groove = self.style().subControlRect(QStyle.ComplexControl.CC_Slider, option,
+                                             QStyle.SubControl.SC_SliderGroove, self)
+        handle = self.style().subControlRect(QStyle.ComplexControl.CC_Slider, option,
+                                             QStyle.SubControl.SC_SliderHandle, self)
+        return groove.x() + handle.width() // 2, groove.width() - handle.width()
+
+    def position_to_x(self, position) -> int:
+        start, span = self._geometry()
+        return start + QStyle.sliderPositionFromValue(self.minimum(), self.maximum(), position, span)
+
+    def x_to_position(self, x) -> int:
+        start, span = self._geometry()
+        return QStyle.sliderValueFromPosition(self.minimum(), self.maximum(), x - start, span)
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        if not self.isSliderDown() and self.maximum() > self.minimum():
+            self.hovered.emit(self.x_to_position(int(event.position().x())))
+
+    def leaveEvent(self, event):
+        super().leaveEvent(event)
+        if not self.isSliderDown():
+            self.left.emit()
+
+
 def format_time(duration_ms: int):
     """Formats duration in ms to a string mm:ss"""
     seconds = duration_ms // 1000
@@ -0,0 +1,106 @@
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QThread, QThreadPool, QTimer
+
+from card_grid import PREVIEW_SIZE
+from constants import PATH_BLANK_IMG, CARDS_PAGE_SIZE, PREFETCH_THREADS, PREFETCH_IDLE_MS, PREFETCH_REFRESH_SEC
+from metrics import timed
+from thumbnails import ThumbnailCache
+from utils import api_client
+from workers import Worker
+
+
+class Prefetcher(QObject):
+    """Фоновый прогрев кэшей карточек и превью.
+
+    Работает в собственном пуле с низким приоритетом и ограниченным числом
+    потоков. Пока идёт загрузка по клику пользователя, новые задачи не
+    запускаются, а начатые прерываются между превью.
+    """
+
+    def __init__(self, parent=None, max_threads=PREFETCH_THREADS, idle_ms=PREFETCH_IDLE_MS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.pool.setThreadPriority(QThread.Priority.LowestPriority)
+        self.max_threads = max_threads
+        self.thumbnails = ThumbnailCache()
+        self.all_categories = []
+        self._queue = deque()
+        self._queued = set()
+        self._fetched = {}
+        self._running = {}
+        self._paused = False
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(idle_ms)
+        self.idle_timer.timeout.connect(lambda: self.prefetch(self.all_categories))
+
+    def set_categories(self, category_ids):
+        """Категории, которые прогреваются, пока приложение простаивает"""
+        self.all_categories = list(category_ids)
+        self.idle_timer.start()
+
+    def prefetch_around(self, node, roots):
+        """Дочерние и соседние категории выбранного узла"""
+        siblings = node.parent.children if node.parent is not None else roots
+        self.prefetch(child.id for child in node.children)
+        self.prefetch(sibling.id for sibling in siblings if sibling is not node)
+
+    def prefetch(self, category_ids):
+        now = time.monotonic()
+        for category_id in category_ids:
+            if category_id in self._queued or category_id in self._running:
+                continue
+            fetched_at = self._fetched.get(category_id)
+            if fetched_at is not None and now - fetched_at < PREFETCH_REFRESH_SEC:
+                continue
+            self._queue.append(category_id)
+            self._queued.add(category_id)
+        self._pump()
+
+    def pause(self):
+        """Уступаем место запросу пользователя"""
+        self._paused = True
+        self.idle_timer.stop()
+
+    def resume(self):
+        self._paused = False
+        self.idle_timer.start()
+        self._pump()
+
+    def stop(self):
+        """Выход из приложения: очередь снимается, начатые задачи прерываются между превью"""
+        self._queue.clear()
+        self._queued.clear()
+        self.pause()
+
+    def _pump(self):
+        while not self._paused and self._queue and len(self._running) < self.max_threads:
+            category_id = self._queue.popleft()
+            self._queued.discard(category_id)
+            worker = Worker(self._warm, category_id)
+            worker.signals.result.connect(lambda done, category_id=category_id: self._on_result(category_id, done))
+            worker.signals.finished.connect(lambda category_id=category_id: self._on_finished(category_id))
+            self._running[category_id] = worker
+            self.pool.start(worker)
+
+    def _on_result(self, category_id, done):
+        if done:
+            self._fetched[category_id] = time.monotonic()
+
+    def _on_finished(self, category_id):
+        self._running.pop(category_id, None)
+        self._pump()
+
+    @timed("prefetch.warm")
+    def _warm(self, category_id):
+        """Выполняется в рабочем потоке: первая страница карточек и её превью на диск"""
+        cards = api_client().request_cards(category_id, limit=CARDS_PAGE_SIZE)
+        for card in cards:
+            if self._paused:
+                return False
+            self.thumbnails.image(card["preview_image_url"] or PATH_BLANK_IMG, PREVIEW_SIZE)
+        return True
@@ -0,0 +1,287 @@
+"""Превью карточек из кадров видео.
+
+Кадр берёт ffmpeg (фильтр thumbnail выбирает самый характерный кадр из
+нескольких подряд, начиная с 10% длительности), процессы запускаются из
+пула потоков. Без ffmpeg кадр достаёт QMediaPlayer с QVideoSink без окна —
+в потоке GUI, по одному видео за раз. Готовое превью уменьшается, кладётся
+в хранилище медиа и записывается в карточку.
+
+FFMPEG=/path/to/ffmpeg задаёт ffmpeg явно, иначе он ищется в PATH.
+"""
+import importlib.util
+import os
+import shutil
+import subprocess
+from collections import deque
+
+from PySide6.QtCore import Qt, QObject, QSize, QThreadPool, QTimer, QUrl, Signal, QByteArray, QBuffer, QIODevice
+from PySide6.QtGui import QImage
+
+from constants import PREVIEW_THREADS
+from media_store import put_bytes, acquire, release, remove_files
+from utils import singleton
+from workers import Worker
+
+# Как у превью, добавленного через EditCardDialog
+PREVIEW_SIZE = QSize(150, 150)
+# Откуда брать кадр: начало часто — заставка или чёрный экран
+FRAME_POSITION = 0.1
+FFMPEG_TIMEOUT_SEC = 60
+GRAB_TIMEOUT_MS = 15000
+
+
+def find_ffmpeg() -> str | None:
+    return os.getenv("FFMPEG") or shutil.which("ffmpeg")
+
+
+def has_qt_multimedia() -> bool:
+    return importlib.util.find_spec("PySide6.QtMultimedia") is not None
+
+
+def find_ffprobe(ffmpeg) -> str:
+    """ffprobe из той же поставки, что и ffmpeg"""
+    return os.path.join(os.path.dirname(ffmpeg), "ffprobe") if os.path.dirname(ffmpeg) else "ffprobe"
+
+
+def video_duration(video_path, ffmpeg) -> float | None:
+    """Длительность в секундах через ffprobe рядом с ffmpeg; None — узнать не удалось"""
+    try:
+        output = subprocess.run([find_ffprobe(ffmpeg), "-v", "error", "-show_entries", "format=duration",
+                                 "-of", "csv=p=0", video_path],
+                                capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SEC).stdout
+        return float(output.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def grab_frame(video_path, ffmpeg) -> QImage:
+    """Характерный кадр видео; пустой QImage, если ffmpeg не справился"""
+    duration = video_duration(video_path, ffmpeg)
+    offsets = [duration * FRAME_POSITION, 0] if duration else [0]
+    for offset in offsets:
+        try:
+            output = subprocess.run(
+                [ffmpeg, "-v", "error", "-ss", f"{offset:.3f}", "-i", video_path,
+                 "-vf", f"thumbnail=50,scale=-2:{PREVIEW_SIZE.height() * 2}", "-frames:v", "1",
+                 "-f", "image2pipe", "-vcodec", "png", "-"],
+                capture_output=True, timeout=FFMPEG_TIMEOUT_SEC).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        image = QImage.fromData(output, "PNG")
+        if not image.isNull():
+            return image
+    return QImage()
+
+
+def store_preview_image(image: QImage, extension=".jpg") -> str | None:
+    """Уменьшаем картинку до превью и кладём в хранилище; None, если сохранить не вышло.
+    GIF Qt не записывает — такое превью сохраняем в PNG"""
+    if image.isNull():
+        return None
+    scaled = image.scaled(PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                          Qt.TransformationMode.SmoothTransformation)
+    extension = extension.lower()
+    if extension == ".gif":
+        extension = ".png"
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    saved = scaled.save(buffer, extension.lstrip(".").upper())
+    buffer.close()
+    return put_bytes(bytes(data), extension) if saved else None
+
+
+def set_card_preview(card_id, old_preview, path) -> bool:
+    """Ставим превью карточке, если его не поменяли, пока кадр извлекался.
+    Файл прежнего превью удаляется, если на него больше никто не ссылается"""
+    import uuid
+
+    from sqlalchemy import update
+
+    from models import Card
+    from session import Session
+
+    current = Card.preview_image_url.is_(None) if old_preview is None else Card.preview_image_url == old_preview
+    with Session() as s:
+        result = s.execute(update(Card).where(Card.id == uuid.UUID(str(card_id)), current)
+                           .values(preview_image_url=path))
+        if result.rowcount != 1:
+            s.rollback()
+            return False
+        acquire(s, [path])
+        orphaned = release(s, [old_preview])
+        s.commit()
+    remove_files(orphaned)
+    return True
+
+
+def generate_preview(card_id, video_url, old_preview, ffmpeg=None, image=None) -> str | None:
+    """Кадр (готовый или через ffmpeg) → превью в хранилище → карточка"""
+    if image is None:
+        image = grab_frame(video_url, ffmpeg)
+    path = store_preview_image(image)
+    if path is None or not set_card_preview(card_id, old_preview, path):
+        return None
+    return path
+
+
+def missing_previews() -> list[tuple[str, str, str | None]]:
+    """Карточки без превью или с превью, файла которого нет: (id, видео, превью)"""
+    from sqlalchemy import select
+
+    from models import Card
+    from session import Session
+
+    with Session() as s:
+        rows = s.execute(select(Card.id, Card.video_url, Card.preview_image_url)).all()
+    return [(str(id_), video_url, preview) for id_, video_url, preview in rows
+            if video_url and os.path.exists(video_url) and not (preview and os.path.exists(preview))]
+
+
+class QtFrameGrabber(QObject):
+    """Кадр через QMediaPlayer и QVideoSink без окна. Работает в потоке GUI,
+    видео обрабатываются по очереди; grabbed(ключ, QImage) — пустой при неудаче"""
+    grabbed = Signal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        from PySide6.QtMultimedia import QMediaPlayer, QVideoSink
+
+        self.LoadedMedia = QMediaPlayer.MediaStatus.LoadedMedia
+        self.player = QMediaPlayer(self)
+        self.sink = QVideoSink(self)
+        self.player.setVideoSink(self.sink)
+        self.player.mediaStatusChanged.connect(self._on_status)
+        self.player.errorOccurred.connect(lambda *args: self._finish(QImage()))
+        self.sink.videoFrameChanged.connect(self._on_frame)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(GRAB_TIMEOUT_MS)
+        self.timer.timeout.connect(lambda: self._finish(QImage()))
+        self.queue = deque()
+        self.current = None
+        self.target = None
+
+    def grab(self, key, video_path):
+        self.queue.append((key, video_path))
+        self._next()
+
+    def clear(self):
+        self.queue.clear()
+
+    def _next(self):
+        if self.current is not None or not self.queue:
+            return
+        self.current, video_path = self.queue.popleft()
+        self.target = None
+        self.timer.start()
+        self.player.setSource(QUrl.fromLocalFile(os.path.abspath(video_path)))
+
+    def _on_status(self, status):
+        if status == self.LoadedMedia and self.current is not None and self.target is None:
+            self.target = int(self.player.duration() * FRAME_POSITION)
+            self.player.setPosition(self.target)
+            # Кадры идут в QVideoSink только при воспроизведении; звук никуда не выводится
+            self.player.play()
+
+    def _on_frame(self, frame):
+        if self.current is None or self.target is None or not frame.isValid():
+            return
+        if frame.startTime() // 1000 >= self.target - 500:
+            self._finish(frame.toImage())
+
+    def _finish(self, image):
+        if self.current is None:
+            return
+        self.timer.stop()
+        self.player.stop()
+        self.player.setSource(QUrl())
+        key, self.current = self.current, None
+        self.grabbed.emit(key, image)
+        self._next()
+
+
+class PreviewJobs(QObject):
+    """Очередь создания превью из видео, одна на приложение.
+
+    ready(id карточки, путь) — превью записано в карточку,
+    progress(готово, всего) — по каждой задаче, finished — очередь опустела.
+    """
+    ready = Signal(str, str)
+    progress = Signal(int, int)
+    finished = Signal()
+
+    def __init__(self, max_threads=PREVIEW_THREADS):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.ffmpeg = find_ffmpeg()
+        self.grabber = None
+        self._workers = {}
+        self._done = 0
+        self._total = 0
+
+    def available(self) -> bool:
+        return self.ffmpeg is not None or has_qt_multimedia()
+
+    def submit(self, card_id, video_url, old_preview=None):
+        card_id = str(card_id)
+        if card_id in self._workers or not video_url or not self.available():
+            return
+        self._total += 1
+        if self.ffmpeg is not None:
+            self._start(card_id, Worker(generate_preview, card_id, video_url, old_preview, self.ffmpeg))
+            return
+        if self.grabber is None:
+            self.grabber = QtFrameGrabber(self)
+            self.grabber.grabbed.connect(self._on_grabbed)
+        # Кадр достаём в потоке GUI, а уменьшение и запись — в пуле
+        self._workers[card_id] = None
+        self.grabber.grab((card_id, video_url, old_preview), video_url)
+
+    def pending(self) -> int:
+        return self._total - self._done
+
+    def cancel(self):
+        """Снимаем задачи, которые ещё не начались"""
+        if self.grabber is not None:
+            self.grabber.clear()
+        taken = [card_id for card_id, worker in self._workers.items()
+                 if worker is None or self.pool.tryTake(worker)]
+        for card_id in taken:
+            del self._workers[card_id]
+        if taken:
+            self._step(len(taken))
+
+    def _on_grabbed(self, key, image):
+        card_id, video_url, old_preview = key
+        if card_id not in self._workers:
+            return
+        self._start(card_id, Worker(generate_preview, card_id, video_url, old_preview, image=image))
+
+    def _start(self, card_id, worker):
+        # Задачу держим сами: cancel() обращается к ней и после того, как она доработала
+        worker.setAutoDelete(False)
+        worker.signals.result.connect(lambda path: self._on_result(card_id, path))
+        worker.signals.finished.connect(lambda: self._on_finished(card_id, worker))
+        self._workers[card_id] = worker
+        self.pool.start(worker)
+
+    def _on_result(self, card_id, path):
+        if path is not None:
+            self.ready.emit(card_id, path)
+
+    def _on_finished(self, card_id, worker):
+        if self._workers.get(card_id) is worker:
+            del self._workers[card_id]
+            self._step()
+
+    def _step(self, count=1):
+        self._done += count
+        self.progress.emit(self._done, self._total)
+        if self._done >= self._total:
+            self._done = self._total = 0
+            self.finished.emit()
+
+
+preview_jobs = singleton(PreviewJobs)
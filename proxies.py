@@ -0,0 +1,276 @@
+"""Облегчённые копии видео для просмотра.
+
+Исходники в 4K на слабом ноутбуке декодируются тяжело, а для того, чтобы
+посмотреть технику, хватает 540p. Для каждого видео выше PROXY_HEIGHT ffmpeg
+в фоне делает копию с меньшим битрейтом и частыми ключевыми кадрами —
+lesson.mp4.proxy.mp4 рядом с видео. Плеер открывает её, если она есть,
+а оригинал — по кнопке.
+
+Кодирование идёт кусками по PROXY_CHUNK_SEC: готовые куски лежат в кэше
+(cache/proxies/), и прерванная копия продолжается с первого недоделанного
+куска. Очередь тоже хранится в кэше: то, что не успели к выходу из
+приложения, доделывается при следующем запуске.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+from contextlib import closing
+
+from PySide6.QtCore import QObject, QThreadPool, Signal
+
+from constants import PATH_PROXIES, PROXY_SUFFIX, PROXY_THREADS
+from media_store import temp_path
+from previews import find_ffmpeg, find_ffprobe, video_duration
+from utils import singleton
+from workers import Worker
+
+PROXY_HEIGHT = 540
+PROXY_CRF = 28
+# Ключевой кадр раз в секунду: перемотка по копии почти бесплатна
+PROXY_KEYFRAME_SEC = 1
+PROXY_CHUNK_SEC = 120
+PATH_PROXY_QUEUE = PATH_PROXIES + "queue.json"
+PROBE_TIMEOUT_SEC = 60
+
+
+def proxy_path(video_path) -> str:
+    return video_path + PROXY_SUFFIX
+
+
+def has_proxy(video_path) -> bool:
+    """Копия есть и не старше видео"""
+    try:
+        return os.path.getmtime(proxy_path(video_path)) >= os.path.getmtime(video_path)
+    except OSError:
+        return False
+
+
+def parts_dir(video_path) -> str:
+    """Куски копии: ключ меняется вместе с файлом, и куски от прежнего видео не подхватываются"""
+    stat = os.stat(video_path)
+    key = f"{os.path.abspath(video_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+    return os.path.join(PATH_PROXIES, hashlib.sha1(key).hexdigest())
+
+
+def load_queue() -> list[str]:
+    try:
+        with open(PATH_PROXY_QUEUE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_queue(videos):
+    os.makedirs(PATH_PROXIES, exist_ok=True)
+    tmp_path = temp_path(PATH_PROXY_QUEUE)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(videos, f, ensure_ascii=False)
+        os.replace(tmp_path, PATH_PROXY_QUEUE)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def video_height(video_path, ffmpeg) -> int | None:
+    try:
+        output = subprocess.run([find_ffprobe(ffmpeg), "-v", "error", "-select_streams", "v:0",
+                                 "-show_entries", "stream=height", "-of", "csv=p=0", video_path],
+                                capture_output=True, text=True, timeout=PROBE_TIMEOUT_SEC).stdout
+        return int(output.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def _run_ffmpeg(args):
+    """Процесс ffmpeg; генератор отдаёт закодированные секунды по ходу работы.
+    Если генератор закрыли (задачу отменили), процесс завершается"""
+    process = subprocess.Popen(args + ["-progress", "pipe:1", "-nostats"], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    try:
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            # out_time_ms у ffmpeg исторически в микросекундах, как и out_time_us
+            if key in ("out_time_us", "out_time_ms") and value.isdigit():
+                yield int(value) / 1_000_000
+        errors = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(errors.strip() or f"ffmpeg завершился с кодом {process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def encode_chunk(video_path, ffmpeg, start, destination):
+    tmp_path = temp_path(destination)
+    try:
+        yield from _run_ffmpeg(
+            [ffmpeg, "-v", "error", "-y", "-ss", str(start), "-t", str(PROXY_CHUNK_SEC), "-i", video_path,
+             "-map", "0:v:0", "-map", "0:a:0?",
+             "-vf", f"scale=-2:{PROXY_HEIGHT}", "-c:v", "libx264", "-preset", "veryfast", "-crf", str(PROXY_CRF),
+             "-force_key_frames", f"expr:gte(t,n_forced*{PROXY_KEYFRAME_SEC})",
+             "-c:a", "aac", "-b:a", "96k", "-ac", "2", "-f", "mp4", tmp_path])
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def make_proxy(video_path, ffmpeg):
+    """Облегчённая копия видео. Генератор отдаёт (готово, всего) в секундах;
+    результат — путь к копии или None, если видео и так не выше PROXY_HEIGHT"""
+    if has_proxy(video_path):
+        return proxy_path(video_path)
+    height = video_height(video_path, ffmpeg)
+    if height is not None and height <= PROXY_HEIGHT:
+        return None
+    duration = video_duration(video_path, ffmpeg)
+    if not duration:
+        raise ValueError(f"Не удалось узнать длительность {video_path}")
+
+    directory = parts_dir(video_path)
+    os.makedirs(directory, exist_ok=True)
+    parts = []
+    for n in range(math.ceil(duration / PROXY_CHUNK_SEC)):
+        start = n * PROXY_CHUNK_SEC
+        part = os.path.join(directory, f"{n:05}.mp4")
+        if not os.path.exists(part):
+            # При отмене закрываем и кодирование куска, чтобы остановить ffmpeg
+            with closing(encode_chunk(video_path, ffmpeg, start, part)) as encoding:
+                for done in encoding:
+                    yield min(start + done, duration), duration
+        parts.append(part)
+        yield min(start + PROXY_CHUNK_SEC, duration), duration
+
+    # Склейка без перекодирования; готовая копия появляется на месте одним переименованием
+    list_path = os.path.join(directory, "parts.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.writelines(f"file '{os.path.abspath(part)}'\n" for part in parts)
+    path = proxy_path(video_path)
+    tmp_path = temp_path(path)
+    try:
+        with closing(_run_ffmpeg([ffmpeg, "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                                  "-c", "copy", "-movflags", "+faststart", "-f", "mp4", tmp_path])) as joining:
+            for _ in joining:
+                yield duration, duration
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    shutil.rmtree(directory, ignore_errors=True)
+    return path
+
+
+def all_videos() -> list[str]:
+    """Видео всех карточек, файлы которых на месте"""
+    from sqlalchemy import select
+
+    from models import Card
+    from session import Session
+
+    with Session() as s:
+        videos = s.execute(select(Card.video_url).distinct()).scalars().all()
+    return [video for video in videos if video and os.path.exists(video)]
+
+
+class ProxyJobs(QObject):
+    """Очередь облегчённых копий, одна на приложение.
+
+    ready(видео, копия) — копия готова, progress(готово, всего) — по задачам,
+    finished — очередь опустела. Очередь сохраняется в кэше при каждом
+    изменении, stop() прерывает кодирование, но очередь оставляет —
+    resume() при следующем запуске её продолжает.
+    """
+    ready = Signal(str, str)
+    progress = Signal(int, int)
+    finished = Signal()
+
+    def __init__(self, max_threads=PROXY_THREADS):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.ffmpeg = find_ffmpeg()
+        self._workers = {}
+        self._stopping = False
+        self._done = 0
+        self._total = 0
+
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def submit(self, video_path, urgent=False):
+        """Ставим видео в очередь; urgent — его открыли в плеере, оно идёт первым"""
+        if not video_path or not self.available() or self._stopping:
+            return
+        if video_path in self._workers:
+            if urgent and self.pool.tryTake(self._workers[video_path]):
+                self.pool.start(self._workers[video_path], 1)
+            return
+        if has_proxy(video_path):
+            self.ready.emit(video_path, proxy_path(video_path))
+            return
+        worker = Worker(make_proxy, video_path, self.ffmpeg)
+        # Задачу держим сами: cancel() обращается к ней и после того, как она доработала
+        worker.setAutoDelete(False)
+        worker.signals.result.connect(lambda path: self._on_result(video_path, path))
+        worker.signals.finished.connect(lambda: self._on_finished(video_path, worker))
+        self._workers[video_path] = worker
+        self._total += 1
+        save_queue(list(self._workers))
+        self.pool.start(worker, 1 if urgent else 0)
+
+    def resume(self):
+        """Доделываем очередь, прерванную прошлым выходом из приложения"""
+        for video_path in load_queue():
+            if os.path.exists(video_path):
+                self.submit(video_path)
+        if not self._workers:
+            save_queue([])
+
+    def pending(self) -> int:
+        return self._total - self._done
+
+    def cancel(self):
+        """Снимаем всю очередь; начатые куски остаются и пригодятся при следующей постановке"""
+        for video_path, worker in list(self._workers.items()):
+            if self.pool.tryTake(worker):
+                del self._workers[video_path]
+                self._step()
+            else:
+                worker.cancel()
+        save_queue(list(self._workers))
+
+    def stop(self):
+        """Выход из приложения: останавливаем ffmpeg, очередь остаётся для resume()"""
+        self._stopping = True
+        for worker in self._workers.values():
+            if not self.pool.tryTake(worker):
+                worker.cancel()
+
+    def _on_result(self, video_path, path):
+        if path is not None:
+            self.ready.emit(video_path, path)
+
+    def _on_finished(self, video_path, worker):
+        if self._stopping or self._workers.get(video_path) is not worker:
+            return
+        # Задача с ошибкой тоже снимается, иначе она повторялась бы при каждом запуске
+        del self._workers[video_path]
+        save_queue(list(self._workers))
+        self._step()
+
+    def _step(self):
+        self._done += 1
+        self.progress.emit(self._done, self._total)
+        if self._done >= self._total:
+            self._done = self._total = 0
+            self.finished.emit()
+
+
+proxy_jobs = singleton(ProxyJobs)
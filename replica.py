@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from category_tree import CategoryRow
+from constants import PATH_REPLICA, CARDS_PAGE_SIZE
+from metrics import timed
+from utils import singleton
+
+# Запас по времени при выборке изменений: строки, закоммиченные чуть позже
+# с более ранним now(), не теряются. Повторно пришедшие строки не перезаписываются
+SYNC_OVERLAP = timedelta(minutes=1)
+SQLITE_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    parent_id TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    preview_image_url TEXT,
+    video_url TEXT NOT NULL,
+    category_id TEXT,
+    invisible INTEGER NOT NULL DEFAULT 0,
+    description TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cards_category_title ON cards (category_id, title, id);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    card_id TEXT,
+    comment TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    table_name TEXT PRIMARY KEY,
+    cursor TEXT NOT NULL
+);
+"""
+
+# Синхронизируемые таблицы: имя модели и колонки (без updated_at).
+# Модели и SQLAlchemy импортируются только в sync(), то есть в фоновом потоке
+SYNCED = (
+    ("Category", ("id", "name", "parent_id")),
+    ("Card", ("id", "title", "preview_image_url", "video_url", "category_id", "invisible", "description")),
+    ("Comment", ("id", "user_id", "card_id", "comment")),
+)
+
+CARD_COLUMNS = "id, title, preview_image_url, video_url, description, invisible, category_id"
+
+
+def _to_sqlite(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _uuid(value):
+    return uuid.UUID(value) if value is not None else None
+
+
+class Replica:
+    """Локальная копия каталога в SQLite.
+
+    Главное окно читает категории и карточки отсюда, не дожидаясь сервера.
+    sync() забирает из PostgreSQL строки, изменённые после прошлой
+    синхронизации (по updated_at), и удаляет строки, которых на сервере больше
+    нет. Если сервер недоступен, приложение работает с последней копией.
+    """
+
+    def __init__(self, path=PATH_REPLICA):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self._lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def is_empty(self):
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM categories LIMIT 1").fetchone() is None
+
+    def categories(self) -> list[CategoryRow]:
+        with self._lock:
+            rows = self.connection.execute("SELECT id, name, parent_id FROM categories").fetchall()
+        return [CategoryRow(_uuid(row["id"]), row["name"], _uuid(row["parent_id"])) for row in rows]
+
+    def first_category_id(self):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT id FROM categories WHERE parent_id IS NULL ORDER BY name LIMIT 1").fetchone()
+        return _uuid(row["id"]) if row else None
+
+    @timed("replica.cards_page")
+    def cards_page(self, category_id, cursor=None, all=False, subtree=False, limit=CARDS_PAGE_SIZE):
+        """Страница карточек и курсор следующей — как utils.request_cards_page"""
+        if subtree:
+            cards = self._subtree_cards(category_id, cursor, all, limit)
+            # id в ключе — UUID, как у сервера: ключ можно передать любому из них
+            next_cursor = (cards[-1]["title"], _uuid(cards[-1]["id"])) if len(cards) == limit else None
+        else:
+            offset = cursor or 0
+            cards = self._category_cards(category_id, offset, all, limit)
+            next_cursor = offset + len(cards) if len(cards) == limit else None
+        return cards, next_cursor
+
+    def _category_cards(self, category_id, offset, all, limit):
+        query = f"SELECT {CARD_COLUMNS} FROM cards WHERE category_id = ?"
+        if not all:
+            query += " AND invisible = 0"
+        query += " ORDER BY title, id LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self.connection.execute(query, (str(category_id), limit, offset)).fetchall()
+        return [self._card(row) for row in rows]
+
+    def _subtree_cards(self, category_id, after, all, limit):
+        """Карточки поддерева: тот же рекурсивный запрос, что и к серверу"""
+        query = f"""
+            WITH RECURSIVE subtree(id) AS (
+                SELECT id FROM categories WHERE id = ?
+                UNION ALL
+                SELECT categories.id FROM categories JOIN subtree ON categories.parent_id = subtree.id
+            )
+            SELECT {CARD_COLUMNS} FROM cards WHERE category_id IN (SELECT id FROM subtree)
+        """
+        params = [str(category_id)]
+        if not all:
+            query += " AND invisible = 0"
+        if after is not None:
+            query += " AND (title, id) > (?, ?)"
+            params.extend(_to_sqlite(value) for value in after)
+        query += " ORDER BY title, id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [self._card(row) for row in rows]
+
+    @staticmethod
+    def _card(row) -> dict:
+        card = dict(row)
+        card["invisible"] = bool(card["invisible"])
+        return card
+
+    @timed("replica.sync")
+    def sync(self) -> bool:
+        """Забираем изменения с сервера. Возвращает True, если копия изменилась.
+
+        Удаления ищем, только если после изменений строк локально станет
+        не столько же, сколько на сервере: полный список id таблицы
+        читается лишь тогда, а не при каждой синхронизации. Сервер
+        опрашивается до блокировки: главное окно читает копию под той же
+        блокировкой и не ждёт сети.
+        """
+        from sqlalchemy import func, select
+        import models
+        from session import Session
+
+        with Session() as s:
+            changes = []
+            for model_name, columns in SYNCED:
+                model = getattr(models, model_name)
+                table = model.__tablename__
+                cursor = self._cursor(table)
+                query = select(model)
+                if cursor is not None:
+                    query = query.where(model.updated_at > cursor - SYNC_OVERLAP)
+                rows = s.execute(query).scalars().all()
+                total = s.execute(select(func.count()).select_from(model)).scalar()
+                ids = None
+                if self._count_after(table, rows) != total:
+                    ids = {str(id_) for id_ in s.execute(select(model.id)).scalars()}
+                changes.append((table, columns, rows, ids))
+
+        with self._lock, self.connection:
+            before = self.connection.total_changes
+            for table, columns, rows, ids in changes:
+                self._apply(table, columns, rows)
+                if ids is not None:
+                    self._remove_missing(table, ids)
+            return self.connection.total_changes != before
+
+    def _count_after(self, table, rows) -> int:
+        """Сколько строк будет в таблице копии, когда rows запишутся"""
+        changed = [str(row.id) for row in rows]
+        with self._lock:
+            count = self.connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            known = 0
+            # Пачками: у SQLite ограничено число параметров запроса
+            for start in range(0, len(changed), SQLITE_BATCH):
+                batch = changed[start:start + SQLITE_BATCH]
+                known += self.connection.execute(
+                    f"SELECT count(*) FROM {table} WHERE id IN ({', '.join('?' * len(batch))})", batch).fetchone()[0]
+        return count + len(changed) - known
+
+    def _cursor(self, table):
+        with self._lock:
+            row = self.connection.execute("SELECT cursor FROM sync_state WHERE table_name = ?",
+                                          (table,)).fetchone()
+        return datetime.fromisoformat(row["cursor"]) if row else None
+
+    def _apply(self, table, columns, rows):
+        names = ", ".join(columns + ("updated_at",))
+        placeholders = ", ".join("?" * (len(columns) + 1))
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns + ("updated_at",))
+        # Строку перезаписываем, только если она действительно изменилась
+        self.connection.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({placeholders}) "
+            f"ON CONFLICT (id) DO UPDATE SET {assignments} "
+            f"WHERE {table}.updated_at IS NOT excluded.updated_at",
+            [[_to_sqlite(getattr(row, column)) for column in columns] + [row.updated_at.isoformat()]
+             for row in rows],
+        )
+        if rows:
+            cursor = max(row.updated_at for row in rows)
+            self.connection.execute(
+                "INSERT INTO sync_state (table_name, cursor) VALUES (?, ?) "
+                "ON CONFLICT (table_name) DO UPDATE SET cursor = excluded.cursor "
+                "WHERE excluded.cursor > sync_state.cursor",
+                (table, cursor.isoformat()),
+            )
+
+    def _remove_missing(self, table, ids):
+        """Удаляем строки, которых на сервере больше нет"""
+        local_ids = [row[0] for row in self.connection.execute(f"SELECT id FROM {table}")]
+        removed = [(id_,) for id_ in local_ids if id_ not in ids]
+        self.connection.executemany(f"DELETE FROM {table} WHERE id = ?", removed)
+
+
+replica = singleton(Replica)
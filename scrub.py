@@ -0,0 +1,199 @@
+"""Раскадровка видео для перемотки в плеере.
+
+Для каждого видео в фоне строятся два файла рядом с ним:
+lesson.mp4.keyframes.json — время ключевых кадров и параметры листа,
+lesson.mp4.sprites.jpg — лист уменьшенных кадров через равные промежутки.
+Пока ползунок тянут или над ним держат мышь, плеер показывает кадр из листа,
+а настоящая перемотка идёт один раз, когда ползунок отпустили, и сразу на
+ближайший ключевой кадр — с него декодер начинает без лишней работы.
+
+Файлы строит ffmpeg (ffprobe читает ключевые кадры из пакетов, без
+декодирования); без ffmpeg раскадровки нет и плеер перематывает как раньше.
+"""
+import json
+import math
+import os
+import subprocess
+from bisect import bisect_left
+
+from PySide6.QtCore import QObject, QRect, QThreadPool, Signal
+from PySide6.QtGui import QPixmap
+
+from constants import SCRUB_THREADS, SCRUB_INDEX_SUFFIX, SCRUB_SPRITES_SUFFIX
+from media_store import temp_path
+from previews import find_ffmpeg, find_ffprobe, video_duration
+from utils import singleton
+from workers import Worker
+
+# Кадр в листе; 16:9, меньшие кадры вписываются с полями
+TILE_WIDTH = 160
+TILE_HEIGHT = 90
+TILE_COLUMNS = 10
+# Кадр не чаще чем раз в столько секунд, и не больше MAX_TILES на видео:
+# у длинных видео промежуток растёт, а лист остаётся небольшим
+TILE_INTERVAL_SEC = 2
+MAX_TILES = 200
+SCRUB_TIMEOUT_SEC = 600
+
+
+def index_path(video_path) -> str:
+    return video_path + SCRUB_INDEX_SUFFIX
+
+
+def sprites_path(video_path) -> str:
+    return video_path + SCRUB_SPRITES_SUFFIX
+
+
+def read_keyframes(video_path, ffmpeg) -> list[int]:
+    """Время ключевых кадров в мс по флагам пакетов: видео не декодируется"""
+    output = subprocess.run(
+        [find_ffprobe(ffmpeg), "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+         "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, timeout=SCRUB_TIMEOUT_SEC, check=True).stdout
+    keyframes = set()
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                keyframes.add(round(float(pts_time) * 1000))
+            except ValueError:
+                continue
+    return sorted(keyframes)
+
+
+def build_sprites(video_path, ffmpeg, duration, destination) -> dict:
+    """Лист кадров через равные промежутки. Декодируются только ключевые кадры:
+    кадр в листе может отстоять от своего места на GOP, для превью это неважно"""
+    interval = max(TILE_INTERVAL_SEC, duration / MAX_TILES)
+    count = max(1, min(MAX_TILES, math.ceil(duration / interval)))
+    columns = min(TILE_COLUMNS, count)
+    rows = math.ceil(count / columns)
+    # ffmpeg выбирает формат по расширению
+    tmp_path = temp_path(destination, ".part.jpg")
+    try:
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-skip_frame", "nokey", "-i", video_path, "-an",
+             "-vf", f"fps=1/{interval:.3f},"
+                    f"scale={TILE_WIDTH}:{TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+                    f"pad={TILE_WIDTH}:{TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+                    f"tile={columns}x{rows}",
+             "-frames:v", "1", "-q:v", "5", tmp_path],
+            capture_output=True, timeout=SCRUB_TIMEOUT_SEC, check=True)
+        os.replace(tmp_path, destination)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"interval_ms": round(interval * 1000), "count": count, "columns": columns,
+            "tile": [TILE_WIDTH, TILE_HEIGHT]}
+
+
+def build_scrub(video_path, ffmpeg) -> str:
+    """Ключевые кадры и лист для видео; уже построенные для этого файла не пересобираем.
+    Индекс пишется последним: по нему видно, что раскадровка готова"""
+    if is_fresh(video_path):
+        return video_path
+    duration = video_duration(video_path, ffmpeg)
+    if not duration:
+        raise ValueError(f"Не удалось узнать длительность {video_path}")
+    keyframes = read_keyframes(video_path, ffmpeg)
+    index = build_sprites(video_path, ffmpeg, duration, sprites_path(video_path))
+    index.update(duration_ms=round(duration * 1000), keyframes=keyframes)
+    path = index_path(video_path)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return video_path
+
+
+def is_fresh(video_path) -> bool:
+    """Раскадровка есть и не старше видео"""
+    try:
+        video_mtime = os.path.getmtime(video_path)
+        return all(os.path.getmtime(path) >= video_mtime
+                   for path in (index_path(video_path), sprites_path(video_path)))
+    except OSError:
+        return False
+
+
+class ScrubIndex:
+    """Готовая раскадровка видео в памяти плеера"""
+
+    def __init__(self, index, sprites: QPixmap):
+        self.keyframes = index["keyframes"]
+        self.interval_ms = index["interval_ms"]
+        self.count = index["count"]
+        self.columns = index["columns"]
+        self.tile_width, self.tile_height = index["tile"]
+        self.sprites = sprites
+
+    def frame(self, position) -> QPixmap:
+        """Кадр из листа для позиции в мс"""
+        n = min(max(position, 0) // self.interval_ms, self.count - 1)
+        row, column = divmod(n, self.columns)
+        return self.sprites.copy(QRect(column * self.tile_width, row * self.tile_height,
+                                       self.tile_width, self.tile_height))
+
+    def nearest_keyframe(self, position) -> int:
+        """Ближайший к позиции ключевой кадр; без индекса — сама позиция"""
+        if not self.keyframes:
+            return position
+        i = bisect_left(self.keyframes, position)
+        candidates = self.keyframes[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda keyframe: abs(keyframe - position))
+
+
+def load_scrub(video_path) -> ScrubIndex | None:
+    """Раскадровка с диска; None, если её ещё нет или она устарела. Только в потоке GUI (QPixmap)"""
+    if not video_path or not is_fresh(video_path):
+        return None
+    try:
+        with open(index_path(video_path), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    sprites = QPixmap(sprites_path(video_path))
+    if sprites.isNull():
+        return None
+    return ScrubIndex(index, sprites)
+
+
+class ScrubJobs(QObject):
+    """Очередь построения раскадровок, одна на приложение. ready(путь к видео) — готово"""
+    ready = Signal(str)
+
+    def __init__(self, max_threads=SCRUB_THREADS):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.ffmpeg = find_ffmpeg()
+        self._workers = {}
+
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def submit(self, video_path):
+        if not video_path or video_path in self._workers or not self.available():
+            return
+        if is_fresh(video_path):
+            self.ready.emit(video_path)
+            return
+        worker = Worker(build_scrub, video_path, self.ffmpeg)
+        worker.signals.result.connect(self.ready.emit)
+        worker.signals.finished.connect(lambda: self._workers.pop(video_path, None))
+        # Держим ссылку до завершения, иначе объект сигналов удалится раньше времени
+        self._workers[video_path] = worker
+        self.pool.start(worker)
+
+    def cancel(self):
+        """Снимаем раскадровки, которые ещё не начали строиться"""
+        for video_path, worker in list(self._workers.items()):
+            if self.pool.tryTake(worker):
+                del self._workers[video_path]
+
+
+scrub_jobs = singleton(ScrubJobs)
@@ -1,7 +1,8 @@
 import os
+import threading
+
 from dotenv import load_dotenv
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, Session as BaseSession
 
 
 load_dotenv()
@@ -11,7 +12,73 @@ db_name = os.getenv("DB_NAME")
 db_user = os.getenv("DB_USER")
 db_password = os.getenv("DB_PASSWORD")
 
-engine = create_engine(f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}")
+# Параметры пула соединений; переопределяются переменными окружения или configure_engine()
+engine_options = {
+    "url": f"postgresql://{db_user}:{db_password}@{db_host}/{db_name}",
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") != "0",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+}
+# Сколько соединений открывает warm_up()
+POOL_WARM = int(os.getenv("DB_POOL_WARM", 2))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def configure_engine(**options):
+    """Меняем параметры движка. Уже созданный движок закрывается
+    и будет создан заново при следующем запросе"""
+    global _engine
+    with _engine_lock:
+        engine_options.update(options)
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def get_engine():
+    """Движок создаётся при первом обращении к БД, а не при импорте модуля"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from sqlalchemy import create_engine
+
+            options = dict(engine_options)
+            url = options.pop("url")
+            connect_timeout = options.pop("connect_timeout")
+            if url.startswith("postgresql"):
+                options["connect_args"] = {"connect_timeout": connect_timeout}
+            elif url.startswith("sqlite"):
+                options["connect_args"] = {"timeout": connect_timeout}
+            _engine = create_engine(url, **options)
+        return _engine
+
+
+class LazySession(BaseSession):
+    """Сессия без привязки при создании: движок берётся при первом запросе"""
+
+    def get_bind(self, mapper=None, **kwargs):
+        return get_engine()
+
+
+def warm_up(connections=None):
+    """Открываем соединения заранее (в фоне, пока строится интерфейс),
+    чтобы первые запросы не ждали подключения к серверу"""
+    engine = get_engine()
+    opened = []
+    try:
+        for _ in range(connections or POOL_WARM):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in opened:
+            connection.close()
+
 
-Session = sessionmaker(bind=engine)
+Session = sessionmaker(class_=LazySession)
 session = Session()
@@ -0,0 +1,60 @@
+import json
+import os
+import uuid
+
+from category_tree import CategoryRow
+from constants import PATH_SNAPSHOT
+
+
+class Snapshot:
+    """Снимок главного окна на момент закрытия: дерево категорий, выбранная
+    категория и первая страница её карточек.
+
+    При следующем запуске окно рисуется из снимка сразу, до обращения к
+    локальной копии и серверу, а свежие данные подменяют его следом.
+    """
+    __slots__ = ("categories", "category_id", "subtree", "cards")
+
+    def __init__(self, categories, category_id=None, subtree=False, cards=None):
+        self.categories = categories
+        self.category_id = category_id
+        self.subtree = subtree
+        self.cards = cards or []
+
+
+def _uuid(value):
+    return uuid.UUID(value) if value is not None else None
+
+
+def _str(value):
+    return str(value) if value is not None else None
+
+
+def load_snapshot(path=PATH_SNAPSHOT) -> Snapshot | None:
+    """Снимок прошлого запуска; None, если его нет или он повреждён"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return Snapshot(
+            [CategoryRow(_uuid(id_), name, _uuid(parent_id)) for id_, name, parent_id in data["categories"]],
+            _uuid(data["category_id"]),
+            data["subtree"],
+            data["cards"],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_snapshot(tree, category_id, subtree, cards, path=PATH_SNAPSHOT):
+    """Сохраняем снимок атомарно: недописанный файл не подменит прошлый"""
+    data = {
+        "categories": [[_str(node.id), node.name, _str(node.parent_id)] for node in tree],
+        "category_id": _str(category_id),
+        "subtree": subtree,
+        "cards": cards,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,196 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+from PySide6.QtCore import Qt, QSize, QObject, QThread, QThreadPool, Signal
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+
+from constants import PATH_THUMBNAILS, THUMBNAIL_MEMORY_LIMIT_KB
+from metrics import count, timer
+from utils import singleton
+from workers import Worker
+
+
+@singleton
+class ThumbnailCache:
+    """Кэш уменьшенных превью карточек.
+
+    Два уровня: файлы на диске (переживают перезапуск) и QPixmapCache в памяти
+    (LRU с вытеснением по лимиту). Ключ строится из пути, времени изменения,
+    размера файла и целевого размера, поэтому изменённый исходник даёт новый ключ,
+    а старые файлы этого исходника удаляются.
+    """
+
+    def __init__(self, cache_dir=PATH_THUMBNAILS, memory_limit_kb=THUMBNAIL_MEMORY_LIMIT_KB):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        QPixmapCache.setCacheLimit(memory_limit_kb)
+
+    def key(self, path, size: QSize, mode=Qt.AspectRatioMode.IgnoreAspectRatio):
+        """Ключ превью или None, если исходного файла нет"""
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        return f"{self._prefix(path, size, mode)}_{stat.st_mtime_ns}_{stat.st_size}"
+
+    def image(self, path, size: QSize, mode=Qt.AspectRatioMode.IgnoreAspectRatio) -> QImage:
+        """Превью в виде QImage. Можно вызывать из рабочих потоков"""
+        key = self.key(path, size, mode)
+        if key is None:
+            return QImage()
+        cache_path = os.path.join(self.cache_dir, key + ".png")
+        with timer("thumbnail.disk_read"):
+            image = QImage(cache_path)
+        if not image.isNull():
+            count("thumbnail.disk_hit")
+            return image
+
+        with timer("thumbnail.decode"):
+            image = self._decode(path, size, mode)
+        if image.isNull():
+            return image
+        self._invalidate(path, size, mode)
+        with timer("thumbnail.disk_write"):
+            self._write(image, cache_path)
+        return image
+
+    def pixmap(self, path, size: QSize, mode=Qt.AspectRatioMode.IgnoreAspectRatio) -> QPixmap:
+        """Превью в виде QPixmap. Только из GUI-потока"""
+        key = self.key(path, size, mode)
+        if key is None:
+            return QPixmap()
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            count("thumbnail.memory_hit")
+            return pixmap
+        with timer("thumbnail.pixmap_miss"):
+            pixmap = QPixmap.fromImage(self.image(path, size, mode))
+        if not pixmap.isNull():
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def insert(self, path, size: QSize, mode, image: QImage) -> QPixmap:
+        """Кладём в память превью, декодированное в рабочем потоке. Только из GUI-потока"""
+        key = self.key(path, size, mode)
+        pixmap = QPixmap.fromImage(image)
+        if key is not None and not pixmap.isNull():
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def cached_pixmap(self, path, size: QSize, mode=Qt.AspectRatioMode.IgnoreAspectRatio):
+        """Превью из памяти без обращения к диску, иначе None"""
+        key = self.key(path, size, mode)
+        if key is None:
+            return None
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None or pixmap.isNull():
+            return None
+        return pixmap
+
+    def _write(self, image: QImage, cache_path):
+        """Пишем превью через свой временный файл: одну картинку (например, заглушку)
+        одновременно кладут в кэш несколько потоков. Не вышло — это просто промах кэша"""
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cache_path) + ".", suffix=".tmp",
+                                        dir=self.cache_dir)
+        os.close(fd)
+        try:
+            if image.save(tmp_path, "PNG"):
+                os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _prefix(self, path, size: QSize, mode):
+        path_hash = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return f"{path_hash}_{size.width()}x{size.height()}_{int(mode.value)}"
+
+    def _invalidate(self, path, size: QSize, mode):
+        """Удаляем превью, построенные по прежней версии файла"""
+        for stale in glob.glob(os.path.join(self.cache_dir, self._prefix(path, size, mode) + "_*.png")):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _decode(path, size: QSize, mode) -> QImage:
+        """Декодируем сразу в уменьшенном размере, не поднимая полный кадр"""
+        reader = QImageReader(str(path))
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        if source_size.isValid():
+            reader.setScaledSize(source_size.scaled(size, mode))
+        image = reader.read()
+        if image.isNull():
+            return image
+        if image.size() != size and mode == Qt.AspectRatioMode.IgnoreAspectRatio:
+            image = image.scaled(size, mode, Qt.TransformationMode.SmoothTransformation)
+        return image
+
+
+class ThumbnailLoader(QObject):
+    """Асинхронная загрузка превью одного размера для модели.
+
+    pixmap() сразу отдаёт превью из памяти, а если его там нет — ставит
+    декодирование в пул потоков и возвращает None. Когда превью готово,
+    приходит сигнал ready с путём к исходнику.
+    """
+    ready = Signal(str)
+
+    def __init__(self, size: QSize, mode=Qt.AspectRatioMode.IgnoreAspectRatio, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.size = size
+        self.mode = mode
+        self.cache = ThumbnailCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or QThread.idealThreadCount())
+        self._pending = {}
+        self._failed = set()
+
+    def pixmap(self, path):
+        """Превью из памяти; None — идёт загрузка; пустой QPixmap — показать нечего"""
+        key = self.cache.key(path, self.size, self.mode)
+        if key is None or key in self._failed:
+            return QPixmap()
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+        self._request(path, key)
+        return None
+
+    def pending(self):
+        return len(self._pending)
+
+    def cancel(self):
+        """Снимаем задачи, которые ещё не начались; начатые доработают в дисковый кэш"""
+        for worker in self._pending.values():
+            if not self.pool.tryTake(worker):
+                worker.cancel()
+        self._pending.clear()
+
+    def _request(self, path, key):
+        if path in self._pending:
+            return
+        worker = Worker(self.cache.image, path, self.size, self.mode)
+        # Задачу удаляем сами: cancel() обращается к ней, пока сигнал finished ещё в очереди
+        worker.setAutoDelete(False)
+        worker.signals.result.connect(lambda image: self._on_result(path, key, image))
+        worker.signals.finished.connect(lambda: self._on_finished(path, worker))
+        self._pending[path] = worker
+        self.pool.start(worker)
+
+    def _on_result(self, path, key, image):
+        if image.isNull():
+            # Битый файл не декодируем повторно, пока он не изменится (ключ учитывает mtime)
+            self._failed.add(key)
+        else:
+            self.cache.insert(path, self.size, self.mode, image)
+        self.ready.emit(path)
+
+    def _on_finished(self, path, worker):
+        if self._pending.get(path) is worker:
+            del self._pending[path]
@@ -1,18 +1,26 @@
 import os
-import niquests
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from urllib.parse import urlencode
+from uuid import UUID
 
-from sqlalchemy import UUID
+from constants import CARDS_PAGE_SIZE
+from metrics import count, timed, timer
 
-from session import db_host
+# niquests, SQLAlchemy и модели импортируются при первом запросе: модуль нужен
+# окнам уже при старте, а сеть и БД — только в фоновых задачах
 
 
 def singleton(class_):
     instances = {}
+    lock = threading.Lock()
 
     def getinstance(*args, **kwargs):
-        if class_ not in instances:
-            instances[class_] = class_(*args, **kwargs)
+        with lock:
+            if class_ not in instances:
+                instances[class_] = class_(*args, **kwargs)
         return instances[class_]
 
     return getinstance
@@ -31,11 +39,270 @@ def now_formated():
     return datetime.now().date().strftime("%Y-%m-%d")
 
 
-def request_cards(category_id, all=False) -> list[dict[str, str]]:
-    request = niquests.get(f'http://{db_host}:8080/api/cards?categoryId={str(category_id)}&all={all}')
-    return request.json()
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "stored_at")
+
+    def __init__(self, body, etag=None, last_modified=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self.stored_at
+
+
+class ResponseCache:
+    """Ответы API вместе с валидаторами (ETag / Last-Modified).
+
+    Ограничен по числу записей, давно не использованные вытесняются.
+    Закэшированные тела отдаются всем вызывающим, изменять их нельзя.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def invalidate(self, prefix=""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+class ApiClient:
+    """Клиент API карточек.
+
+    Один niquests.Session на всё приложение: соединения переиспользуются
+    (keep-alive), пул ограничен по размеру и общий для всех потоков, у каждого
+    запроса есть таймауты на подключение и чтение.
+
+    GET-ответы кэшируются и перепроверяются условными запросами: на 304 отдаётся
+    сохранённое тело. При cache_ttl > 0 ответ моложе этого срока отдаётся без
+    обращения к серверу (медленная связь). Если сервер недоступен, отдаётся
+    последний сохранённый ответ.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=None, read_timeout=None, pool_size=None,
+                 cache_ttl=None):
+        from session import db_host
+
+        self.base_url = (base_url or os.getenv("API_URL") or f"http://{db_host}:8080").rstrip("/")
+        self.timeout = (
+            float(connect_timeout or os.getenv("API_CONNECT_TIMEOUT", 3)),
+            float(read_timeout or os.getenv("API_READ_TIMEOUT", 15)),
+        )
+        self.pool_size = int(pool_size or os.getenv("API_POOL_SIZE", 8))
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.cache_ttl = float(cache_ttl if cache_ttl is not None else os.getenv("API_CACHE_TTL", 0))
+        self.cache = ResponseCache()
+        # Понимает ли сервер limit/offset: None — ещё неизвестно
+        self.paging = None
+
+    @property
+    def session(self):
+        """Сессия создаётся при первом запросе, а не при старте приложения"""
+        with self._session_lock:
+            if self._session is None:
+                import niquests
+
+                self._session = niquests.Session(pool_connections=1, pool_maxsize=self.pool_size)
+            return self._session
+
+    @staticmethod
+    def cache_key(path, params=None):
+        return f"{path}?{urlencode(params)}" if params else path
+
+    def get_json(self, path, params=None):
+        import niquests
+
+        key = self.cache_key(path, params)
+        cached = self.cache.get(key)
+        if cached is not None and self.cache_ttl > 0 and cached.age() < self.cache_ttl:
+            count("api.cache_fresh")
+            return cached.body
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        try:
+            with timer("api.request"):
+                response = self.session.get(f"{self.base_url}{key}", headers=headers, timeout=self.timeout)
+        except (niquests.exceptions.ConnectionError, niquests.exceptions.Timeout):
+            if cached is not None:
+                count("api.offline_stale")
+                return cached.body
+            raise
+
+        if response.status_code == 304 and cached is not None:
+            count("api.not_modified")
+            cached.stored_at = time.monotonic()
+            return cached.body
+        response.raise_for_status()
+        with timer("api.json"):
+            body = response.json()
+        self.cache.put(key, CachedResponse(body, response.headers.get("ETag"),
+                                           response.headers.get("Last-Modified")))
+        return body
+
+    def cached_json(self, path, params=None):
+        """Последний сохранённый ответ без обращения к серверу, иначе None"""
+        cached = self.cache.get(self.cache_key(path, params))
+        return cached.body if cached is not None else None
+
+    def invalidate(self, prefix=""):
+        """Сбрасываем кэш после изменения данных"""
+        self.cache.invalidate(prefix)
+
+    def request_cards(self, category_id, all=False, limit=None, offset=0) -> list[dict[str, str]]:
+        """Карточки категории, с limit — одна страница.
+        Сервер, который не знает limit/offset, отдаёт категорию целиком. Это замечаем
+        по первому же ответу: полный ответ кэшируется один раз, без постраничных ключей,
+        и дальше страницы вырезаются из него без запросов категории целиком"""
+        if limit is None or self.paging is False:
+            cards = None
+            if limit is not None and offset:
+                # Первая страница уже проверила полный ответ на свежесть; дальше листаем его без запросов
+                cards = self.cached_json("/api/cards", self.cards_params(category_id, all))
+            if cards is None:
+                cards = self.get_json("/api/cards", self.cards_params(category_id, all))
+            return cards if limit is None else cards[offset:offset + limit]
+        params = self.cards_params(category_id, all, limit, offset)
+        cards = self.get_json("/api/cards", params)
+        if len(cards) > limit:
+            self.paging = False
+            entry = self.cache.pop(self.cache_key("/api/cards", params))
+            if entry is not None:
+                self.cache.put(self.cache_key("/api/cards", self.cards_params(category_id, all)), entry)
+            return cards[offset:offset + limit]
+        return cards
+
+    def cached_cards(self, category_id, all=False, limit=None, offset=0):
+        if limit is None or self.paging is False:
+            cards = self.cached_json("/api/cards", self.cards_params(category_id, all))
+            return cards if cards is None or limit is None else cards[offset:offset + limit]
+        return self.cached_json("/api/cards", self.cards_params(category_id, all, limit, offset))
+
+    @staticmethod
+    def cards_params(category_id, all=False, limit=None, offset=0):
+        params = {"categoryId": str(category_id), "all": str(all)}
+        if limit is not None:
+            params["limit"] = str(limit)
+            params["offset"] = str(offset)
+        return params
+
+    def get_first_category_id(self) -> UUID:
+        return self.get_json("/api/categories/ids")[0]
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+api_client = singleton(ApiClient)
+
+
+@timed("request_cards")
+def request_cards(category_id, all=False, subtree=False) -> list[dict[str, str]]:
+    if subtree:
+        return [card for page in iter_subtree_cards(category_id, all) for card in page]
+    return api_client().request_cards(category_id, all)
+
+
+@timed("request_cards_page")
+def request_cards_page(category_id, cursor=None, all=False, subtree=False, limit=CARDS_PAGE_SIZE):
+    """Одна страница карточек и курсор следующей (None — страниц больше нет).
+
+    В обычном режиме курсор — смещение для параметров limit/offset API
+    (если сервер их не понимает, страницу вырезает ApiClient.request_cards).
+    В режиме поддерева курсор — ключ (title, id) последней карточки.
+    """
+    if subtree:
+        return request_subtree_page(category_id, cursor, all, limit)
+    offset = cursor or 0
+    cards = api_client().request_cards(category_id, all, limit, offset)
+    next_cursor = offset + len(cards) if len(cards) == limit else None
+    return cards, next_cursor
 
 
 def get_first_category_id() -> UUID:
-    request = niquests.get(f'http://{db_host}:8080/api/categories/ids')
-    return request.json()[0]
\ No newline at end of file
+    return api_client().get_first_category_id()
+
+
+def card_to_dict(card: "Card") -> dict:
+    """Карточка из БД в том же виде, что отдаёт API"""
+    return {
+        "id": str(card.id),
+        "title": card.title,
+        "preview_image_url": card.preview_image_url,
+        "video_url": card.video_url,
+        "description": card.description,
+        "invisible": card.invisible,
+        "category_id": str(card.category_id),
+    }
+
+
+def subtree_cards_query(category_id, all=False):
+    """Карточки категории и всех её потомков: один рекурсивный запрос"""
+    from sqlalchemy import select
+    from models import Card, Category
+
+    subtree = select(Category.id).where(Category.id == category_id).cte("subtree", recursive=True)
+    subtree = subtree.union_all(select(Category.id).where(Category.parent_id == subtree.c.id))
+    query = select(Card).where(Card.category_id.in_(select(subtree.c.id)))
+    if not all:
+        query = query.where(Card.invisible.is_(False))
+    return query.order_by(Card.title, Card.id)
+
+
+@timed("db.subtree_page")
+def request_subtree_page(category_id, after=None, all=False, limit=CARDS_PAGE_SIZE):
+    """Страница карточек поддерева после ключа (title, id).
+
+    Ключ вместо OFFSET: каждая следующая страница стоит столько же, сколько первая.
+    id в ключе приводится к UUID: ключ мог прийти от локальной копии со строковым id.
+    """
+    from sqlalchemy import tuple_
+    from models import Card
+    from session import Session
+
+    query = subtree_cards_query(category_id, all)
+    if after is not None:
+        title, id_ = after
+        query = query.where(tuple_(Card.title, Card.id) > tuple_(title, UUID(str(id_))))
+    with Session() as s:
+        cards = s.execute(query.limit(limit)).scalars().all()
+    next_cursor = (cards[-1].title, cards[-1].id) if len(cards) == limit else None
+    return [card_to_dict(card) for card in cards], next_cursor
+
+
+def iter_subtree_cards(category_id, all=False, page_size=CARDS_PAGE_SIZE):
+    """Карточки поддерева страницами по page_size. Первая страница отдаётся всегда, даже пустая"""
+    cards, cursor = request_subtree_page(category_id, None, all, page_size)
+    yield cards
+    while cursor is not None:
+        cards, cursor = request_subtree_page(category_id, cursor, all, page_size)
+        if cards:
+            yield cards
@@ -0,0 +1,214 @@
+import inspect
+import time
+from functools import partial
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+from constants import CARDS_PAGE_SIZE
+from metrics import record
+from replica import replica
+from utils import get_first_category_id, request_cards_page
+
+# Откуда пришла страница карточек
+SOURCE_SERVER = "server"
+SOURCE_REPLICA = "replica"
+
+
+def offline_errors():
+    """Ошибки, при которых считаем, что сервер недоступен, и читаем локальную копию.
+    Импорт здесь, чтобы niquests и SQLAlchemy грузились в рабочем потоке, а не при старте"""
+    import niquests
+    from sqlalchemy.exc import OperationalError
+
+    return niquests.exceptions.RequestException, OperationalError
+
+
+def warm_up_database():
+    """Открываем пул соединений с БД; SQLAlchemy импортируется здесь же, в рабочем потоке"""
+    from session import warm_up
+
+    warm_up()
+
+
+class WorkerSignals(QObject):
+    """Сигналы фоновой задачи (QRunnable не умеет испускать сигналы сам)"""
+    result = Signal(object)
+    progress = Signal(object)
+    error = Signal(object)
+    finished = Signal()
+
+
+class Worker(QRunnable):
+    """Выполняет функцию в пуле потоков и возвращает результат через сигналы.
+
+    Если функция — генератор, каждое значение уходит в progress по мере
+    готовности, значение из его return — в result, а отмена прерывает его
+    между значениями.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        """Результат отменённой задачи никуда не отправляется"""
+        self.cancelled = True
+
+    @Slot()
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+            if inspect.isgenerator(result):
+                generator, result = result, None
+                while not self.cancelled:
+                    try:
+                        item = next(generator)
+                    except StopIteration as stop:
+                        result = stop.value
+                        break
+                    self.signals.progress.emit(item)
+                else:
+                    generator.close()
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(e)
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+def fetch_cards_page(category_id, cursor, subtree, source=None):
+    """Страница карточек категории; без категории берём первую.
+    Если сервер недоступен, страница берётся из локальной копии.
+    source — откуда пришла предыдущая страница; возвращается и источник этой"""
+    try:
+        if category_id is None:
+            category_id = get_first_category_id()
+        return _read_page(partial(request_cards_page, category_id, subtree=subtree), SOURCE_SERVER,
+                          category_id, cursor, subtree, source)
+    except offline_errors():
+        if category_id is None:
+            category_id = replica().first_category_id()
+            if category_id is None:
+                raise
+        return _read_page(partial(replica().cards_page, category_id, subtree=subtree), SOURCE_REPLICA,
+                          category_id, cursor, subtree, source)
+
+
+def _read_page(read, source, category_id, cursor, subtree, previous_source):
+    """Страница из одного источника.
+
+    Смещение имеет смысл только внутри своего источника: если сервер и копия
+    расходятся, то же смещение у другого источника пропустит или повторит
+    карточки. Поэтому при смене источника посреди листания категории всё
+    показанное плюс страница читаются заново с начала, и restart=True.
+    Ключ (title, id) в режиме поддерева от источника не зависит: id в нём у обоих UUID.
+    """
+    restart = not subtree and bool(cursor) and previous_source not in (None, source)
+    if restart:
+        cards, next_cursor = read(None, limit=cursor + CARDS_PAGE_SIZE)
+    else:
+        cards, next_cursor = read(cursor)
+    return category_id, cards, next_cursor, source, restart
+
+
+class CardsLoader(QObject):
+    """Асинхронная постраничная загрузка карточек для главного окна.
+
+    load() запрашивает первую страницу категории, load_more() — следующую.
+    Одновременно актуальна только последняя категория: её запрос отменяет
+    предыдущий, а результат устаревшего запроса, если всё же пришёл,
+    отбрасывается. Первая страница приходит через loaded, остальные через appended;
+    если посреди листания сменился источник (сервер или локальная копия),
+    уже показанные карточки приходят заново целиком через reloaded.
+    """
+    loaded = Signal(object, list)
+    appended = Signal(object, list)
+    reloaded = Signal(object, list)
+    failed = Signal(object, object)
+    done = Signal()
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._generation = 0
+        self._current = None
+        self._workers = set()
+        self._category_id = None
+        self._subtree = False
+        self._cursor = None
+        self._source = None
+        self._has_more = False
+        self._started = 0.0
+
+    def load(self, category_id, subtree=False):
+        self.cancel()
+        self._generation += 1
+        self._category_id = category_id
+        self._subtree = subtree
+        self._cursor = None
+        self._source = None
+        self._has_more = True
+        self._fetch(first=True)
+
+    def load_more(self) -> bool:
+        """Следующая страница, если она есть и предыдущая уже пришла; True — запрос ушёл"""
+        if self._current is None and self._has_more and self._category_id is not None:
+            self._fetch(first=False)
+            return True
+        return False
+
+    def loading(self) -> bool:
+        return self._current is not None
+
+    def has_more(self):
+        return self._has_more
+
+    def cancel(self):
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+
+    def _fetch(self, first):
+        generation = self._generation
+        category_id = self._category_id
+        worker = Worker(fetch_cards_page, category_id, self._cursor, self._subtree, self._source)
+        worker.signals.result.connect(lambda result: self._on_result(generation, first, result))
+        worker.signals.error.connect(lambda error: self._on_error(generation, category_id, error))
+        worker.signals.finished.connect(lambda: self._workers.discard(worker))
+        # Держим ссылку до завершения, иначе объект сигналов удалится раньше времени
+        self._workers.add(worker)
+        self._current = worker
+        self._started = time.perf_counter()
+        self.pool.start(worker)
+
+    def _on_result(self, generation, first, result):
+        if generation != self._generation:
+            return
+        self._current = None
+        # Время от запроса до ответа в GUI-потоке, вместе с ожиданием в очереди пула
+        record("cards.first_page" if first else "cards.next_page", (time.perf_counter() - self._started) * 1000)
+        category_id, cards, self._cursor, self._source, restart = result
+        self._category_id = category_id
+        self._has_more = self._cursor is not None
+        if first:
+            self.loaded.emit(category_id, cards)
+        elif restart:
+            self.reloaded.emit(category_id, cards)
+        else:
+            self.appended.emit(category_id, cards)
+        self.done.emit()
+
+    def _on_error(self, generation, category_id, error):
+        if generation != self._generation:
+            return
+        self._current = None
+        self._has_more = False
+        self.failed.emit(category_id, error)
+        self.done.emit()